@@ -1,26 +1,71 @@
 import streamlit as st
 import uuid
+import duckdb
 from pathlib import Path
 
-from parsers.registry import get_parser
-from parsers.ocr import GeminiBatchOCR
-from index.duck_index import run_indexing
+from schema import connect
+from parsers.uploads import save_upload, upload_sha256
+from jobs.job_queue import JobQueue, jobs_db_path
+from jobs.worker import start_worker
+from index.duck_index import get_index_version
 from retriever.query import QueryEmbedder
 from retriever.search import OpenSearchRetriever
+from index.local_index import LocalVectorIndex
 from retriever.generator import RAGGenerator
+from retriever.cache import QueryCache
+from retriever.context import pack_context, CONTEXT_TOKENS
+from rag.dedup import ensure_dedup_tables, chunk_sources
+from rag.metrics import EventLog, stage_summary
 from opensearchpy import OpenSearch
 
 # Paths & DB
 DB_PATH = "C:\\Projects\\Project RAG\\V3\\rag_demo.duckdb"
+JOBS_DB = jobs_db_path(DB_PATH)  # ingest job queue; the worker process owns writes to DB_PATH
 UPLOAD_DIR = Path("uploads")
+EMBED_BACKEND = "gemini"  # or "hashing" / "onnx" for fully offline embedding
+LOCAL_INDEX_DIR = None    # e.g. "vector_index" to serve from an on-disk index instead of OpenSearch
+INDEX_NAME = f"local:{LOCAL_INDEX_DIR}" if LOCAL_INDEX_DIR else "rag-chunks"
+# Query cache sizes / TTLs (seconds, None = no expiry)
+QUERY_CACHE = dict(embed_size=4096, embed_ttl=None, retrieval_size=1024, retrieval_ttl=600,
+                   answer_size=512, answer_ttl=3600)
 UPLOAD_DIR.mkdir(exist_ok=True)
 
 # Initialize RAG components
 client = OpenSearch(hosts=[{"host":"localhost","port":9200}], http_compress=True)
-embedder = QueryEmbedder()
-retriever = OpenSearchRetriever(client)
+embedder = QueryEmbedder(backend=EMBED_BACKEND)
+retriever = LocalVectorIndex(LOCAL_INDEX_DIR, dim=768) if LOCAL_INDEX_DIR else OpenSearchRetriever(client)
 generator = RAGGenerator()
 
+@st.cache_resource
+def get_query_cache():
+    # One cache per server process, shared across sessions and reruns
+    return QueryCache(**QUERY_CACHE)
+
+@st.cache_resource
+def get_event_log():
+    # Query-path timings go to ingest_events alongside the ingest stages.
+    # Connects per flush: holding DB_PATH open would lock the ingest worker out.
+    return EventLog(db_path=DB_PATH)
+
+@st.cache_resource
+def get_job_queue():
+    return JobQueue(JOBS_DB)
+
+def read_db(fn, default=None):
+    """fn(con) on a short-lived DB_PATH connection, or `default` while the ingest worker holds the file."""
+    try:
+        con = connect(DB_PATH, timeout_s=1.0)
+    except duckdb.IOException:
+        return default
+    try:
+        return fn(con)
+    finally:
+        con.close()
+
+query_cache = get_query_cache()
+events = get_event_log()
+job_queue = get_job_queue()
+
 st.set_page_config(page_title="RAG File Chat")
 st.title("BIG File Parser")
 
@@ -31,33 +76,110 @@ uploaded_files = st.file_uploader(
 )
 
 if uploaded_files:
+    # Uploads stay selected across reruns (every interaction); each is handled once per session
+    handled = st.session_state.setdefault("handled_uploads", set())
+    queued = 0
     for f in uploaded_files:
+        if f.file_id in handled:
+            continue
+        content_hash = upload_sha256(f)
+        # Same bytes as a file already queued or ingested: reuse its pages and chunks
+        # (the worker re-checks against files ingested before the queue existed)
+        known = job_queue.find_by_hash(content_hash)
+        if known:
+            events.log(known[0], "upload_duplicate", True, f"{f.name} matches {known[1]}")
+            state = "ingested" if known[2] == "indexed" else "queued"
+            st.info(f"Already {state}: {f.name} (same content as {known[1]})")
+            handled.add(f.file_id)
+            continue
         file_path = UPLOAD_DIR / f"{uuid.uuid4()}_{f.name}"
-        with open(file_path, "wb") as out:
-            out.write(f.getbuffer())
-        st.success(f"Saved: {f.name}")
-
-        # Parse
-        parser = get_parser(str(file_path), DB_PATH)
-        parser.parse(file_id=str(uuid.uuid4()), file_path=str(file_path))
-        st.info(f"Parsed: {f.name}")
+        save_upload(f, file_path)
+        job_queue.enqueue(str(uuid.uuid4()), f.name, file_path.resolve(), content_hash)
+        handled.add(f.file_id)
+        queued += 1
+    if queued:
+        # Parse, OCR and indexing run in the background worker; this page only polls
+        start_worker(DB_PATH, JOBS_DB, embed_backend=EMBED_BACKEND, local_index_dir=LOCAL_INDEX_DIR)
+        st.success(f"Queued {queued} file(s) for ingestion")
 
-    # Optional OCR for images/scanned PDFs
-    ocr = GeminiBatchOCR(DB_PATH)
-    ocr.process(batch_limit=16)  # batch limit for demo
+@st.fragment(run_every=2)
+def ingest_progress():
+    counts = job_queue.counts()
+    total = sum(counts.values())
+    if not total:
+        return
+    done = counts.get("indexed", 0) + counts.get("failed", 0)
+    st.progress(done / total, text=f"{counts.get('indexed', 0)}/{total} files indexed"
+                + (f" · {counts['failed']} failed" if counts.get("failed") else ""))
+    if done < total and not job_queue.worker_alive():
+        start_worker(DB_PATH, JOBS_DB, embed_backend=EMBED_BACKEND, local_index_dir=LOCAL_INDEX_DIR)
+    st.dataframe(job_queue.recent(), hide_index=True)
 
-    # Chunk + embed + index
-    n_indexed = run_indexing(DB_PATH)
-    st.success(f"Indexed {n_indexed} chunks into OpenSearch")
+ingest_progress()
 
 
 st.header("Ask a Question")
+files = read_db(lambda con: con.execute(
+    "SELECT file_id, file_name, uploaded_at FROM files ORDER BY uploaded_at DESC"
+).fetchall())
+if files is None:
+    # Main DB busy with an ingest batch: files indexed through the queue are still searchable
+    files = job_queue.indexed_files()
+labels = {fid: f"{name} ({uploaded:%Y-%m-%d %H:%M})" for fid, name, uploaded in files}
+scope = st.multiselect("Search in files (empty = all files):", options=list(labels), format_func=labels.get)
 query = st.text_input("Type your question here:")
 
 if query:
     
-    q_vec = embedder.embed_query(query)
-    chunks = retriever.retrieve(q_vec)
-    answer = generator.generate_answer(query, chunks)
+    version = read_db(lambda con: get_index_version(con, INDEX_NAME))
+    if version is not None:  # else keep the cached version until the ingest batch finishes
+        query_cache.sync_index_version(version)
+    with events.span("query_embed", n_items=1, n_bytes=len(query.encode())):
+        q_vec = query_cache.embed_query(embedder, query)
+    with events.span("search") as span:
+        hits = query_cache.retrieve_hits(retriever, q_vec, filters={"file_ids": scope} if scope else None)
+        span.n_items = len(hits)
+    with events.span("context_pack", n_items=len(hits)) as span:
+        # Locations of index-time near-duplicates, cited alongside their canonical chunk
+        def dup_sources(con):
+            ensure_dedup_tables(con)
+            return chunk_sources(con, [h["chunk_id"] for h in hits])
+        context = pack_context(hits, CONTEXT_TOKENS, names={fid: name for fid, name, _ in files},
+                               sources=read_db(dup_sources, {}))
+        span.n_bytes = sum(len(b.encode()) for b in context.blocks)
+        span.message = context.summary()
     st.subheader("Answer")
-    st.write(answer)
+    # Answers are cached under the model that wrote them (the fallback wins some hedged races)
+    answer = (query_cache.cached_answer(query, hits, generator.primary_model)
+              or query_cache.cached_answer(query, hits, generator.fallback_model))
+    if answer is None:
+        # Stream tokens as they arrive; the fallback model is hedged in if the primary is slow.
+        # Failures are recorded by the span and shown as a short message, not a traceback.
+        try:
+            with events.span("generate", n_items=len(hits)) as span:
+                answer = st.write_stream(generator.stream_answer(query, context.blocks))
+                span.n_bytes = len(answer.encode())
+                span.message = generator.last_metrics["model"]
+        except TimeoutError:
+            st.error(f"No answer within {generator.deadline_s:g} s. Please try again.")
+        except Exception as e:
+            st.error(f"Answer generation failed: {type(e).__name__}: {e}")
+        else:
+            m = generator.last_metrics
+            if not m["timed_out"]:  # a deadline-truncated answer must not be replayed as complete
+                query_cache.store_answer(query, hits, m["model"], answer)
+            st.caption(f"{m['model']} · first token {m['ttft_s']:.2f}s · total {m['total_s']:.2f}s"
+                       + (" · hedged" if m["hedged"] else "") + (" · deadline hit" if m["timed_out"] else ""))
+    else:
+        st.write(answer)
+    st.caption(context.summary())
+    st.caption(" · ".join(f"{name} cache {s['hit_rate']:.0%} ({s['hits']}/{s['hits'] + s['misses']})"
+                          for name, s in query_cache.stats().items()))
+
+with st.expander("Pipeline metrics"):
+    events.flush()
+    summary = read_db(stage_summary)
+    if summary is None:
+        st.caption("Ingest worker is writing; metrics will show once the batch finishes.")
+    else:
+        st.dataframe(summary, hide_index=True)
@@ -0,0 +1,63 @@
+# Bulk indexing throughput against the fake OpenSearch: one helpers.bulk call
+# (the previous loader) vs BulkIndexer with byte-sized batches, parallel
+# requests and 429 retries.
+# Usage: python -m bench.bench_bulk --docs 5000 --latency 0.05 --s-per-mb 0.05 --reject 0.01
+import argparse
+import time
+
+import numpy as np
+from opensearchpy import helpers
+
+from index.bulk_indexer import BulkIndexer, bulk_load_settings
+from bench.fakes import FakeOpenSearch
+
+INDEX = "bench-chunks"
+
+def make_chunks(n, dim):
+    rng = np.random.default_rng(0)
+    vecs = rng.standard_normal((n, dim), dtype=np.float32)
+    return [{"chunk_id": f"c{i}", "file_id": f"f{i % 10}", "page_no": i // 10, "ord": i % 10,
+             "text": f"chunk {i} " * 80, "embedding": vecs[i].tolist()} for i in range(n)]
+
+def fake(args):
+    client = FakeOpenSearch(bulk_latency_s=args.latency, bulk_s_per_mb=args.s_per_mb, reject_p=args.reject)
+    client.indices.create(INDEX, body={"settings": {"index": {"refresh_interval": "1s"}}})
+    return client
+
+def bench_helpers_bulk(args, chunks):
+    client = fake(args)
+    actions = ({"_op_type": "index", "_index": INDEX, "_id": c["chunk_id"], "_source": c} for c in chunks)
+    t0 = time.perf_counter()
+    _, errors = helpers.bulk(client, actions, raise_on_error=False)
+    return time.perf_counter() - t0, len(client.docs[INDEX]), len(errors)
+
+def bench_bulk_indexer(args, chunks, workers):
+    client = fake(args)
+    indexer = BulkIndexer(client, INDEX, max_chunk_bytes=args.max_mb * 1024 * 1024, workers=workers, backoff_s=0.05)
+    t0 = time.perf_counter()
+    with bulk_load_settings(client, INDEX):
+        indexer.upsert(chunks)
+    assert client.settings[INDEX].get("refresh_interval") == "1s" and client.refreshes == 1
+    return time.perf_counter() - t0, len(client.docs[INDEX]), 0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=5000)
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--latency", type=float, default=0.05, help="seconds per bulk request")
+    ap.add_argument("--s-per-mb", type=float, default=0.05, help="extra seconds per MB of request body")
+    ap.add_argument("--reject", type=float, default=0.01, help="probability of a 429 per item")
+    ap.add_argument("--max-mb", type=int, default=8)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    args = ap.parse_args()
+    chunks = make_chunks(args.docs, args.dim)
+
+    rows = [("helpers.bulk", *bench_helpers_bulk(args, chunks))]
+    for w in args.workers:
+        rows.append((f"BulkIndexer x{w}", *bench_bulk_indexer(args, chunks, w)))
+    print()
+    for name, dt, stored, lost in rows:
+        print(f"{name:16s} {args.docs / dt:9.1f} docs/s  ({dt:.2f}s, {stored}/{args.docs} stored, {lost} dropped)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# Chunker throughput: the old multi-pass chunker vs the single-pass offset chunker.
+# Checks both produce identical chunks (ids, text, n_tokens) before timing them.
+# Usage: python -m bench.bench_chunking --pages 2000
+import argparse
+import random
+import re
+import time
+
+from rag import chunking
+from rag.chunking import chunk_page, _hash, MAX_TOKENS, MIN_TOKENS, OVERLAP_TOKENS
+
+# --- previous implementation, kept verbatim as the reference ---
+
+def _old_split_blocks(text):
+    blocks, buf = [], []
+    lines = text.splitlines()
+    def flush():
+        if buf:
+            blocks.append("\n".join(buf).strip()); buf.clear()
+    for ln in lines:
+        if ln.strip().startswith("CSV:"):
+            flush(); blocks.append(ln.strip()); continue
+        if re.match(r"^\s*#{1,6}\s+\S", ln):
+            flush(); blocks.append(ln.strip()); continue
+        if ln.strip() == "":
+            flush(); continue
+        buf.append(ln)
+    flush()
+    return [b for b in blocks if b]
+
+def _old_len_tokens(s):
+    return max(1, len(re.findall(r"\w+|\S", s)))
+
+def _old_merge_to_token_windows(blocks):
+    chunks, cur, cur_tokens = [], [], 0
+    for b in blocks:
+        bt = _old_len_tokens(b)
+        if cur_tokens + bt > MAX_TOKENS and cur:
+            chunks.append("\n".join(cur).strip())
+            if OVERLAP_TOKENS > 0 and chunks[-1]:
+                tail = " ".join(chunks[-1].split()[-OVERLAP_TOKENS:])
+                cur, cur_tokens = [tail], _old_len_tokens(tail)
+            else:
+                cur, cur_tokens = [], 0
+        cur.append(b); cur_tokens += bt
+    if cur:
+        chunks.append("\n".join(cur).strip())
+    if chunks and _old_len_tokens(chunks[-1]) < MIN_TOKENS and len(chunks) > 1:
+        chunks[-2] = (chunks[-2] + "\n" + chunks[-1]).strip()
+        chunks.pop()
+    return chunks
+
+def old_chunk_page(file_id, page_no, text):
+    out = []
+    for i, c in enumerate(_old_merge_to_token_windows(_old_split_blocks(text))):
+        out.append({
+            "chunk_id": _hash(f"{file_id}:{page_no}:{i}:{_hash(c)[:12]}"),
+            "file_id": file_id,
+            "page_no": page_no,
+            "ord": i,
+            "text": c,
+            "n_tokens": _old_len_tokens(c),
+        })
+    return out
+
+# --- synthetic pages ---
+
+WORDS = ["revenue", "Q3", "growth", "(net)", "3.5%", "vendor-id", "über", "naïve", "e-mail:", "a/b", "—", "total,"]
+
+def make_page(rng, paragraphs=None):
+    lines = []
+    for _ in range(paragraphs or rng.randint(1, 40)):
+        kind = rng.random()
+        if kind < 0.1:
+            lines.append(f"## Section {rng.randint(1, 99)}")
+        elif kind < 0.2:
+            lines.append("CSV: " + ",".join(rng.choice(WORDS) for _ in range(rng.randint(2, 12))))
+        else:
+            for _ in range(rng.randint(1, 8)):
+                lines.append("  " * rng.randint(0, 1) + " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 30))))
+        lines.append("" if rng.random() < 0.7 else "   ")
+    sep = rng.choice(["\n", "\r\n"])
+    return sep.join(lines)
+
+def check_identical(pages):
+    for file_id, page_no, text in pages:
+        old = old_chunk_page(file_id, page_no, text)
+        new = [{k: c[k] for k in old[0]} for c in chunk_page(file_id, page_no, text)] if old else chunk_page(file_id, page_no, text)
+        if old != new:
+            raise SystemExit(f"chunk mismatch on page {page_no}")
+        for c in chunk_page(file_id, page_no, text):
+            # every chunk's words lie inside its recorded span of the page
+            span = text[c["char_start"]:c["char_end"]].split()
+            if not set(c["text"].split()) <= set(span):
+                raise SystemExit(f"char span mismatch on page {page_no}")
+
+def timed(fn, pages):
+    t0 = time.perf_counter()
+    n = sum(len(fn(f, p, t)) for f, p, t in pages)
+    return n, time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    pages = [("bench", i, make_page(rng)) for i in range(args.pages)]
+    pages += [("bench", -1, ""), ("bench", -2, "\n\n  \n"), ("bench", -3, make_page(rng, 400))]
+    check_identical(pages)
+    print(f"✅ identical chunks on {len(pages)} pages")
+
+    mb = sum(len(t.encode()) for _, _, t in pages) / 1e6
+    for name, fn in (("old", old_chunk_page), ("new", chunking.chunk_page)):
+        n, dt = timed(fn, pages)
+        print(f"{name}: {n / dt:10.1f} chunks/s  {mb / dt:7.2f} MB/s  ({n} chunks, {dt:.2f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# End-to-end pipeline benchmark, fully offline: synthetic corpus -> real parsers ->
+# chunking -> run_indexing -> query path, with in-process fakes for Gemini
+# (embeddings + generation) and OpenSearch (bulk + kNN search) at fixed latencies.
+# The synthetic PDFs carry a text layer, so OCR is not exercised (see bench_ocr).
+# Usage: python -m bench.bench_e2e --pdf 4 --pdf-pages 100 --queries 50 --search-latency 0.01
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import duckdb
+import numpy as np
+
+from schema import create_schema
+from parsers.ingest import ingest_files
+from rag.chunking import chunk_document
+from rag.embed import GeminiEmbedder
+from rag.metrics import stage_summary
+from index.duck_index import run_indexing
+from retriever.search import OpenSearchRetriever
+from retriever.generator import RAGGenerator
+from retriever.context import pack_context
+from bench.corpus import make_corpus, WORDS
+from bench.fakes import FakeGenAIClient, FakeModelSpec, FakeOpenSearch
+
+EMBED_MODEL = "text-embedding-004"
+PRIMARY, FALLBACK = "fake-primary", "fake-fallback"
+
+def peak_rss_mb():
+    """Peak RSS of this process and of its (joined) worker processes, in MB."""
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return float("nan"), float("nan")
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KiB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 2 ** 20
+    return own, children
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--text", type=int, default=2, help="plain-text files")
+    ap.add_argument("--text-kb", type=int, default=256)
+    ap.add_argument("--csv", type=int, default=2, help="CSV files")
+    ap.add_argument("--csv-rows", type=int, default=5000)
+    ap.add_argument("--pdf", type=int, default=2, help="PDF files")
+    ap.add_argument("--pdf-pages", type=int, default=50)
+    ap.add_argument("--workers", type=int, default=None, help="ingest worker processes (default: cpu count)")
+    ap.add_argument("--embed-latency", type=float, default=0.05, help="seconds per embed_content call")
+    ap.add_argument("--bulk-latency", type=float, default=0.02, help="seconds per bulk request")
+    ap.add_argument("--search-latency", type=float, default=0.01, help="seconds per search request")
+    ap.add_argument("--gen-ttft", type=float, default=0.2, help="generation time to first token")
+    ap.add_argument("--gen-token", type=float, default=0.005, help="seconds between generated tokens")
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    genai = FakeGenAIClient({
+        EMBED_MODEL: FakeModelSpec(ttft_s=args.embed_latency),
+        PRIMARY: FakeModelSpec(ttft_s=args.gen_ttft, token_s=args.gen_token),
+        FALLBACK: FakeModelSpec(ttft_s=args.gen_ttft, token_s=args.gen_token),
+    })
+    opensearch = FakeOpenSearch(bulk_latency_s=args.bulk_latency, search_latency_s=args.search_latency)
+    embedder = GeminiEmbedder(EMBED_MODEL, client=genai)
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.duckdb")
+        create_schema(duckdb.connect(db_path))
+        files = make_corpus(tmp, args.text, args.csv, args.pdf, args.text_kb, args.csv_rows, args.pdf_pages, args.seed)
+        mb = sum(os.path.getsize(p) for _, p in files) / 1e6
+        print(f"Corpus: {len(files)} files, {mb:.1f} MB")
+
+        t0 = time.perf_counter()
+        outcome = ingest_files(db_path, files, workers=args.workers)
+        dt = time.perf_counter() - t0
+        failed = {fid: err for fid, (_, err) in outcome.items() if err}
+        if failed:
+            raise SystemExit(f"ingest failed: {failed}")
+        n_pages = sum(n for n, _ in outcome.values())
+        results.append(("ingest", f"{n_pages / dt:10.1f} pages/s", f"{mb / dt:6.2f} MB/s", dt))
+
+        con = duckdb.connect(db_path)
+        pages = [dict(zip(("file_id", "page_no", "text"), r))
+                 for r in con.execute("SELECT file_id, page_no, text FROM pages").fetchall()]
+        con.close()
+        t0 = time.perf_counter()
+        n_chunks = len(chunk_document(pages))
+        dt = time.perf_counter() - t0
+        text_mb = sum(len(p["text"].encode()) for p in pages) / 1e6
+        results.append(("chunk", f"{n_chunks / dt:10.1f} chunks/s", f"{text_mb / dt:6.2f} MB/s", dt))
+        del pages
+
+        t0 = time.perf_counter()
+        n_indexed = run_indexing(db_path, embedder=embedder, client=opensearch)
+        dt = time.perf_counter() - t0
+        results.append(("index", f"{n_indexed / dt:10.1f} chunks/s", f"{opensearch.bulk_calls:4d} bulk calls", dt))
+
+        retriever = OpenSearchRetriever(opensearch)
+        generator = RAGGenerator(PRIMARY, FALLBACK, client=genai)
+        rng = random.Random(args.seed)
+        file_ids = [fid for fid, _ in files]
+        latencies, ttfts, raw_tokens, packed_tokens = [], [], 0, 0
+        for i in range(args.queries):
+            query = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 8)))
+            filters = {"file_ids": [rng.choice(file_ids)]} if i % 2 else None  # half the queries are file-scoped
+            t0 = time.perf_counter()
+            hits = retriever.retrieve_hits(embedder.embed_query(query), filters)
+            context = pack_context(hits)
+            raw_tokens += context.raw_tokens
+            packed_tokens += context.tokens
+            "".join(generator.stream_answer(query, context.blocks))
+            latencies.append(time.perf_counter() - t0)
+            ttfts.append(generator.last_metrics["ttft_s"])
+        if latencies:
+            p50, p99 = np.percentile(latencies, [50, 99])
+            results.append(("query", f"p50 {p50 * 1000:7.1f} ms", f"p99 {p99 * 1000:7.1f} ms", sum(latencies)))
+            results.append(("  ttft", f"p50 {np.percentile(ttfts, 50) * 1000:7.1f} ms",
+                            f"p99 {np.percentile(ttfts, 99) * 1000:7.1f} ms", sum(ttfts)))
+            print(f"Context packing: {raw_tokens} -> {packed_tokens} prompt tokens "
+                  f"({1 - packed_tokens / max(raw_tokens, 1):.0%} saved over {args.queries} queries)")
+
+        print()
+        for name, a, b, dt in results:
+            print(f"{name:8s} {a:>22s}  {b:>16s}  ({dt:.2f}s)")
+        own, children = peak_rss_mb()
+        print(f"peak RSS: {own:.0f} MB (this process), {children:.0f} MB (largest worker)")
+
+        print("\nPer-stage timings from ingest_events:")
+        print(stage_summary(duckdb.connect(db_path)).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# Time-to-first-token / total latency of hedged streaming generation vs the blocking path.
+# Usage: python -m bench.bench_generation
+import time
+
+from retriever.generator import RAGGenerator
+from bench.fakes import FakeGenAIClient, FakeModelSpec
+
+PRIMARY, FALLBACK = "primary", "fallback"
+
+SCENARIOS = {
+    "healthy primary": {PRIMARY: FakeModelSpec(ttft_s=0.3), FALLBACK: FakeModelSpec(ttft_s=0.5)},
+    "slow primary": {PRIMARY: FakeModelSpec(ttft_s=4.0), FALLBACK: FakeModelSpec(ttft_s=0.5)},
+    "failing primary": {PRIMARY: FakeModelSpec(ttft_s=1.5, error=RuntimeError("503")), FALLBACK: FakeModelSpec(ttft_s=0.5)},
+    "both too slow": {PRIMARY: FakeModelSpec(ttft_s=9.0), FALLBACK: FakeModelSpec(ttft_s=9.0)},
+}
+
+def main(hedge_after_s=1.0, deadline_s=5.0):
+    for name, specs in SCENARIOS.items():
+        gen = RAGGenerator(PRIMARY, FALLBACK, client=FakeGenAIClient(specs),
+                           hedge_after_s=hedge_after_s, deadline_s=deadline_s)
+        t0 = time.perf_counter()
+        try:
+            n = sum(1 for _ in gen.stream_answer("q", ["ctx"]))
+            m = gen.last_metrics
+            print(f"{name:16} streamed {n} pieces from {m['model']}: ttft {m['ttft_s']:.2f}s, "
+                  f"total {m['total_s']:.2f}s, hedged={m['hedged']}, timed_out={m['timed_out']}")
+        except Exception as e:
+            print(f"{name:16} failed after {time.perf_counter() - t0:.2f}s: {type(e).__name__}: {e}")
+
+        t0 = time.perf_counter()
+        try:
+            gen.generate_answer("q", ["ctx"])
+            print(f"{'':16} blocking generate_answer: {time.perf_counter() - t0:.2f}s")
+        except Exception:
+            print(f"{'':16} blocking generate_answer failed after {time.perf_counter() - t0:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# Multi-query retrieval against the fake OpenSearch: one search per query with
+# the full _source (the previous retriever), one search per query with the lean
+# _source, and OpenSearchRetriever.retrieve_many (msearch batches, lean _source).
+# Usage: python -m bench.bench_msearch --docs 5000 --queries 500 --latency 0.005
+import argparse
+import time
+
+import numpy as np
+
+from index.open_index import knn_query
+from retriever.search import OpenSearchRetriever
+from bench.fakes import FakeOpenSearch
+from bench.bench_bulk import make_chunks
+
+INDEX = "bench-chunks"
+
+def full_source_search(client, q_vec, k):
+    body = {"size": k, "query": knn_query(q_vec, k)}
+    return [hit["_source"]["text"] for hit in client.search(index=INDEX, body=body)["hits"]["hits"]]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=5000)
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--k", type=int, default=6)
+    ap.add_argument("--latency", type=float, default=0.005, help="seconds per search/msearch round trip")
+    ap.add_argument("--batch", type=int, default=100, help="searches per msearch request")
+    args = ap.parse_args()
+
+    client = FakeOpenSearch(search_latency_s=args.latency)
+    client.docs[INDEX] = {c["chunk_id"]: c for c in make_chunks(args.docs, args.dim)}
+    queries = np.random.default_rng(1).standard_normal((args.queries, args.dim), dtype=np.float32).tolist()
+    retriever = OpenSearchRetriever(client, INDEX, k=args.k, msearch_batch=args.batch)
+
+    def run(name, fn):
+        client.response_bytes = 0
+        t0 = time.perf_counter()
+        results = fn()
+        dt = time.perf_counter() - t0
+        rows.append((name, dt, client.response_bytes))
+        return results
+
+    rows = []
+    legacy = run("search, full _source", lambda: [full_source_search(client, q, args.k) for q in queries])
+    run("search, lean _source", lambda: [retriever.retrieve_hits(q) for q in queries])
+    batched = run(f"msearch x{args.batch}", lambda: retriever.retrieve_many(queries))
+    assert [[h["text"] for h in hits] for hits in batched] == legacy
+
+    print()
+    for name, dt, n_bytes in rows:
+        print(f"{name:22s} {args.queries / dt:9.1f} queries/s  ({dt:.2f}s, "
+              f"{n_bytes / args.queries / 1024:8.1f} KB response per query)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Offline OCR scheduler throughput against a fake model client.
+# Usage: python -m bench.bench_ocr --pages 200 --latency 0.2 --in-flight 1 4 8
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+import duckdb
+from PIL import Image
+
+from schema import create_schema
+from parsers.base_parser import BaseParser
+from parsers.ocr import GeminiBatchOCR
+
+class RateLimited(Exception):
+    code = 429
+
+class FakeOCRModels:
+    """Stands in for client.models: fixed latency, optional 429s, bounded server concurrency."""
+    def __init__(self, latency=0.2, rate_limit_p=0.0, max_concurrent=16):
+        self.latency = latency
+        self.rate_limit_p = rate_limit_p
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.calls = 0
+        self.rejected = 0
+
+    def generate_content(self, model, contents, **kwargs):
+        self.calls += 1
+        if random.random() < self.rate_limit_p or not self.slots.acquire(blocking=False):
+            self.rejected += 1
+            raise RateLimited("429 RESOURCE_EXHAUSTED")
+        try:
+            time.sleep(self.latency)
+            n_images = sum(1 for p in contents[0]["parts"] if "inline_data" in p)
+            text = "\n\n---\n\n".join(f"# Page\nocr text {i}" for i in range(n_images))
+            return SimpleNamespace(text=text)
+        finally:
+            self.slots.release()
+
+def make_render(distinct):
+    """Fake renderer; with `distinct` > 0 only that many different page images exist (cover sheets, forms)."""
+    def render(path, page_nos):
+        return [Image.new("L", (64, 64), color=(n % distinct if distinct else n) % 256) for n in page_nos]
+    return render
+
+def seed_pending(db_path, n_pages):
+    parser = BaseParser(db_path)
+    file_id = str(uuid.uuid4())
+    parser.ensure_file_record(file_id, "scan.pdf")
+    parser.insert_pages(file_id, ((i, "", True, False) for i in range(1, n_pages + 1)))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=200)
+    ap.add_argument("--batch-size", type=int, default=8)
+    ap.add_argument("--latency", type=float, default=0.2)
+    ap.add_argument("--rate-limit-p", type=float, default=0.05)
+    ap.add_argument("--in-flight", type=int, nargs="+", default=[1, 4, 8])
+    ap.add_argument("--distinct", type=int, default=0, help="distinct page images (0 = all different)")
+    args = ap.parse_args()
+
+    for n in args.in_flight:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.duckdb")
+            create_schema(duckdb.connect(db_path))
+            seed_pending(db_path, args.pages)
+            models = FakeOCRModels(args.latency, args.rate_limit_p)
+            ocr = GeminiBatchOCR(db_path, batch_size=args.batch_size, max_in_flight=n, backoff_s=0.05,
+                                 client=SimpleNamespace(models=models), render=make_render(args.distinct))
+            t0 = time.perf_counter()
+            done = ocr.process(batch_limit=args.pages)
+            elapsed = time.perf_counter() - t0
+            print(f"in_flight={n:<3} {done} pages in {elapsed:.2f}s = {done / elapsed:8.1f} pages/s "
+                  f"({models.calls} calls, {models.rejected} rate-limited)")
+            print("   ", duckdb.connect(db_path).execute(
+                "SELECT message FROM ingest_events WHERE stage = 'ocr_cache'").fetchone()[0])
+
+if __name__ == "__main__":
+    main()
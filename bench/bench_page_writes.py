@@ -0,0 +1,51 @@
+# Page write throughput: per-page insert_page vs batched insert_pages.
+# Usage: python -m bench.bench_page_writes --pages 2000
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+import duckdb
+
+from schema import create_schema
+from parsers.base_parser import BaseParser
+
+def make_pages(n, words=300):
+    body = " ".join(f"word{i % 97}" for i in range(words))
+    return [(i, f"Page {i}\n{body}", False, True) for i in range(1, n + 1)]
+
+def bench_per_page(parser, pages):
+    file_id = str(uuid.uuid4())
+    parser.ensure_file_record(file_id, "bench_per_page.pdf")
+    t0 = time.perf_counter()
+    for page_no, text, ocr_needed, ocr_done in pages:
+        parser.insert_page(file_id, page_no, text, ocr_needed, ocr_done)
+    return time.perf_counter() - t0
+
+def bench_batched(parser, pages):
+    file_id = str(uuid.uuid4())
+    parser.ensure_file_record(file_id, "bench_batched.pdf")
+    t0 = time.perf_counter()
+    parser.insert_pages(file_id, iter(pages))
+    return time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=2000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.duckdb")
+        create_schema(duckdb.connect(db_path))
+        parser = BaseParser(db_path)
+        pages = make_pages(args.pages)
+
+        before = bench_per_page(parser, pages)
+        after = bench_batched(parser, pages)
+        print(f"insert_page  (per page): {args.pages / before:10.1f} pages/s  ({before:.2f}s)")
+        print(f"insert_pages (batched) : {args.pages / after:10.1f} pages/s  ({after:.2f}s)")
+        print(f"speedup: {before / after:.1f}x")
+
+if __name__ == "__main__":
+    main()
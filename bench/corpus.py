@@ -0,0 +1,78 @@
+# Synthetic corpora for offline benchmarks: plain text, CSV and multi-page PDFs.
+import csv
+import os
+import random
+
+WORDS = ("invoice contract revenue supplier warranty clause payment delivery schedule quarter "
+         "forecast budget audit compliance shipment customer region margin policy renewal "
+         "liability termination storage capacity turbine sensor pressure valve maintenance").split()
+
+def paragraph(rng, n_words):
+    words = [rng.choice(WORDS) for _ in range(n_words)]
+    words[0] = words[0].capitalize()
+    return " ".join(words) + "."
+
+def write_text(path, rng, kb=256):
+    """Paragraphs with occasional '#' headings until the file reaches ~kb KiB."""
+    size = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while size < kb * 1024:
+            block = (f"# Section {rng.randint(1, 999)}\n" if rng.random() < 0.1 else "") + paragraph(rng, rng.randint(30, 150))
+            f.write(block + "\n\n")
+            size += len(block) + 2
+
+def write_csv(path, rng, rows=5000):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["id", "region", "customer", "amount", "note"])
+        for i in range(rows):
+            w.writerow([i, rng.choice(WORDS), f"cust-{rng.randint(1, 500)}",
+                        f"{rng.uniform(10, 10000):.2f}", paragraph(rng, rng.randint(3, 12))])
+
+def write_pdf(path, pages):
+    """Minimal text-only PDF (Helvetica, one text line per PDF line); `pages` is a list of strings."""
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>",
+            ("<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages))).encode(),
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    for i, text in enumerate(pages):
+        lines, y = [], 800
+        for ln in text.split("\n"):
+            ln = ln.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            lines.append(f"BT /F1 10 Tf 40 {y} Td ({ln}) Tj ET")
+            y -= 12
+        stream = "\n".join(lines).encode("latin-1", "replace")
+        objs.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                    f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode())
+        objs.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for k, obj in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % k + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+def pdf_page(rng, lines=60):
+    return "\n".join(paragraph(rng, rng.randint(8, 14)) for _ in range(lines))
+
+def make_corpus(out_dir, n_text=2, n_csv=2, n_pdf=2, text_kb=256, csv_rows=5000, pdf_pages=50, seed=0):
+    """Write the corpus into out_dir; returns [(file_id, path)] ready for ingest_files()."""
+    rng = random.Random(seed)
+    files = []
+    for i in range(n_text):
+        path = os.path.join(out_dir, f"text_{i}.txt")
+        write_text(path, rng, text_kb)
+        files.append((f"text-{i}", path))
+    for i in range(n_csv):
+        path = os.path.join(out_dir, f"table_{i}.csv")
+        write_csv(path, rng, csv_rows)
+        files.append((f"csv-{i}", path))
+    for i in range(n_pdf):
+        path = os.path.join(out_dir, f"report_{i}.pdf")
+        write_pdf(path, [pdf_page(rng) for _ in range(pdf_pages)])
+        files.append((f"pdf-{i}", path))
+    return files
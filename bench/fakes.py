@@ -0,0 +1,227 @@
+# In-process stand-ins for the Gemini and OpenSearch clients, for offline benchmarks.
+import asyncio
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from opensearchpy.serializer import JSONSerializer
+
+from rag.embed import HashingEmbedder
+
+class FakeModelSpec:
+    """Per-model behaviour: time to first token, delay between tokens, optional failure."""
+    def __init__(self, ttft_s=0.2, token_s=0.01, n_tokens=50, error=None):
+        self.ttft_s = ttft_s
+        self.token_s = token_s
+        self.n_tokens = n_tokens
+        self.error = error
+
+class _FakeAsyncModels:
+    def __init__(self, specs):
+        self.specs = specs
+        self.started = []
+
+    async def generate_content_stream(self, model, contents, config=None):
+        spec = self.specs[model]
+        self.started.append(model)
+
+        async def stream():
+            await asyncio.sleep(spec.ttft_s)
+            if spec.error:
+                raise spec.error
+            for i in range(spec.n_tokens):
+                if i:
+                    await asyncio.sleep(spec.token_s)
+                yield SimpleNamespace(text=f"{model}-tok{i} ")
+        return stream()
+
+class _FakeModels:
+    def __init__(self, specs):
+        self.specs = specs
+        self._vectors = {}
+
+    def embed_content(self, model, contents, config=None):
+        # One ttft_s per call; vectors are feature-hashed so similar texts stay close
+        spec = self.specs[model]
+        time.sleep(spec.ttft_s)
+        if spec.error:
+            raise spec.error
+        dim = getattr(config, "output_dimensionality", None) or 768
+        emb = self._vectors.setdefault(dim, HashingEmbedder(output_dim=dim))
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=v) for v in emb.embed(list(contents))])
+
+    def generate_content(self, model, contents, **kwargs):
+        spec = self.specs[model]
+        time.sleep(spec.ttft_s + spec.token_s * spec.n_tokens)
+        if spec.error:
+            raise spec.error
+        return SimpleNamespace(text=" ".join(f"{model}-tok{i}" for i in range(spec.n_tokens)))
+
+class FakeGenAIClient:
+    """
+    Mimics genai.Client: .models.generate_content / .embed_content and
+    .aio.models.generate_content_stream, with behaviour per model name.
+    """
+    def __init__(self, specs):
+        self.models = _FakeModels(specs)
+        self.aio = SimpleNamespace(models=_FakeAsyncModels(specs))
+
+
+class _FakeIndices:
+    def __init__(self, store):
+        self.store = store
+
+    def exists(self, index):
+        return index in self.store.docs
+
+    def create(self, index, body=None):
+        self.store.docs.setdefault(index, {})
+        self.store.settings[index] = dict((body or {}).get("settings", {}).get("index", {}))
+        self.store.mappings[index] = (body or {}).get("mappings", {})
+
+    def get_mapping(self, index):
+        return {index: {"mappings": self.store.mappings.get(index, {})}}
+
+    def get_settings(self, index, name=None):
+        return {index: {"settings": {"index": dict(self.store.settings.get(index, {}))}}}
+
+    def put_settings(self, body, index=None):
+        for key, value in body.get("index", {}).items():
+            if value is None:
+                self.store.settings[index].pop(key, None)
+            else:
+                self.store.settings[index][key] = value
+
+    def refresh(self, index=None):
+        self.store.refreshes += 1
+
+class FakeOpenSearch:
+    """
+    In-process stand-in for the opensearch-py calls the pipeline makes:
+    indices.exists/create/get_mapping/get_settings/put_settings/refresh, bulk, and search /
+    msearch with a knn clause, answered by exact cosine search with the same bool
+    filters and `_source` filtering. Each bulk call sleeps a fixed latency plus a
+    per-MB cost and rejects each item with 429 with probability `reject_p`; each
+    search or msearch request sleeps a fixed latency. Responses go through a JSON
+    round trip (counted in `response_bytes`) like the real client's.
+    """
+    def __init__(self, bulk_latency_s=0.0, search_latency_s=0.0, bulk_s_per_mb=0.0, reject_p=0.0):
+        self.bulk_latency_s = bulk_latency_s
+        self.search_latency_s = search_latency_s
+        self.bulk_s_per_mb = bulk_s_per_mb
+        self.reject_p = reject_p
+        self.transport = SimpleNamespace(serializer=JSONSerializer())  # helpers.bulk serialises with this
+        self.indices = _FakeIndices(self)
+        self.docs = {}      # index -> {_id: _source}
+        self.settings = {}  # index -> index settings
+        self.mappings = {}  # index -> mappings as created
+        self.bulk_calls = 0
+        self.search_calls = 0
+        self.msearch_calls = 0
+        self.response_bytes = 0
+        self.rejected = 0
+        self.refreshes = 0
+        self._lock = threading.Lock()  # bulk requests arrive from several threads
+        self._matrix = {}   # index -> (ids, normalised vectors), rebuilt after writes
+
+    def bulk(self, body, index=None, **kwargs):
+        body = body.decode() if isinstance(body, bytes) else body
+        time.sleep(self.bulk_latency_s + self.bulk_s_per_mb * len(body) / 1e6)
+        lines = iter(body.splitlines())
+        items = []
+        with self._lock:
+            self.bulk_calls += 1
+            for line in lines:
+                if not line.strip():
+                    continue
+                (op, meta), = json.loads(line).items()
+                idx, _id = meta.get("_index", index), meta.get("_id")
+                docs = self.docs.setdefault(idx, {})
+                source = json.loads(next(lines)) if op in ("index", "create") else None
+                if random.random() < self.reject_p:
+                    self.rejected += 1
+                    status = 429
+                elif op in ("index", "create"):
+                    docs[_id] = source
+                    status = 201
+                elif op == "delete":
+                    status = 200 if docs.pop(_id, None) is not None else 404
+                else:
+                    raise ValueError(f"FakeOpenSearch: unsupported bulk op {op}")
+                self._matrix.pop(idx, None)
+                items.append({op: {"_index": idx, "_id": _id, "status": status}})
+        errors = any(not 200 <= next(iter(i.values()))["status"] < 300 for i in items)
+        return {"took": int(self.bulk_latency_s * 1000), "errors": errors, "items": items}
+
+    def search(self, index, body, **kwargs):
+        time.sleep(self.search_latency_s)
+        self.search_calls += 1
+        return self._respond(self._search(index, body))
+
+    def msearch(self, body, index=None, **kwargs):
+        """body: [header, search body, header, search body, ...] (list or NDJSON)."""
+        time.sleep(self.search_latency_s)
+        self.msearch_calls += 1
+        if isinstance(body, (str, bytes)):
+            body = [json.loads(line) for line in body.splitlines() if line.strip()]
+        responses = [dict(self._search(header.get("index", index), search), status=200)
+                     for header, search in zip(body[::2], body[1::2])]
+        return self._respond({"took": int(self.search_latency_s * 1000), "responses": responses})
+
+    def _respond(self, resp):
+        raw = json.dumps(resp)
+        self.response_bytes += len(raw)
+        return json.loads(raw)
+
+    def _search(self, index, body):
+        knn = body["query"]["knn"]["embedding"]
+        docs = self.docs.get(index, {})
+        ids, mat = self._vectors(index)
+        hits = []
+        if ids:
+            q = np.asarray(knn["vector"], dtype=np.float32)
+            scores = (1 + mat @ (q / max(np.linalg.norm(q), 1e-12))) / 2  # lucene cosinesimil
+            for i in np.argsort(-scores):
+                src = docs[ids[i]]
+                if _matches(src, knn.get("filter")):
+                    hit = {"_index": index, "_id": ids[i], "_score": float(scores[i])}
+                    fields = _source_fields(body.get("_source", True))
+                    if fields is not False:
+                        hit["_source"] = src if fields is True else {f: src[f] for f in fields if f in src}
+                    hits.append(hit)
+                    if len(hits) >= min(knn["k"], body.get("size", knn["k"])):
+                        break
+        return {"took": int(self.search_latency_s * 1000), "hits": {"total": {"value": len(hits)}, "hits": hits}}
+
+    def _vectors(self, index):
+        if index not in self._matrix:
+            docs = self.docs.get(index, {})
+            ids = list(docs)
+            mat = np.asarray([docs[i]["embedding"] for i in ids], dtype=np.float32).reshape(len(ids), -1)
+            mat /= np.maximum(np.linalg.norm(mat, axis=1, keepdims=True), 1e-12)
+            self._matrix[index] = (ids, mat)
+        return self._matrix[index]
+
+def _source_fields(spec):
+    """True (whole _source), False (none) or the list of included fields."""
+    if isinstance(spec, dict):
+        spec = spec.get("includes", True)
+    if isinstance(spec, str):
+        spec = [spec]
+    return spec
+
+def _matches(src, flt):
+    for clause in (flt or {}).get("bool", {}).get("filter", []):
+        (kind, spec), = clause.items()
+        (field, cond), = spec.items()
+        value = src.get(field)
+        if kind == "terms" and value not in cond:
+            return False
+        if kind == "range" and (value is None
+                                or ("gte" in cond and value < cond["gte"])
+                                or ("lte" in cond and value > cond["lte"])):
+            return False
+    return True
@@ -68,7 +68,7 @@ class BaseParser:
 
     def log_event(self, file_id: str, stage: str, ok: bool, message: str = ""):
         self.conn.execute(
-            "INSERT INTO ingest_events VALUES (?, ?, ?, ?, ?, ?)",
+            "INSERT INTO ingest_events (event_id, file_id, stage, ok, message, created_at) VALUES (?, ?, ?, ?, ?, ?)",
             (
                 hashlib.md5(f"{file_id}{time.time()}".encode()).hexdigest(),
                 file_id,
@@ -90,7 +90,8 @@ class BaseParser:
 
     def insert_page(self, file_id, page_no, text, ocr_needed=False, ocr_done=False):
         self.conn.execute("""
-            INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO pages (page_id, file_id, page_no, text, n_tokens, ocr_needed, ocr_done, embedding)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             self.hash_content(f"{file_id}_{page_no}"),
             file_id,
@@ -0,0 +1,123 @@
+# Streaming, parallel OpenSearch bulk loader.
+from contextlib import contextmanager
+from datetime import datetime
+
+from opensearchpy.exceptions import ConnectionTimeout, TransportError
+
+from rag.retry import backoff_sleep, bounded_map
+
+BULK_MAX_BYTES = 8 * 1024 * 1024  # per bulk request body
+BULK_MAX_DOCS = 2000              # per bulk request, whatever the size
+BULK_WORKERS = 4                  # concurrent bulk requests
+
+def _retryable(e: Exception) -> bool:
+    return isinstance(e, ConnectionTimeout) or getattr(e, "status_code", None) in (429, 503)
+
+@contextmanager
+def bulk_load_settings(client, index_name: str):
+    """
+    Turn refresh off for the duration of a load; on exit (also on error) the
+    previous refresh_interval is restored and the index refreshed once.
+    """
+    current = client.indices.get_settings(index=index_name, name="index.refresh_interval")
+    prev = next(iter(current.values()), {}).get("settings", {}).get("index", {}).get("refresh_interval")
+    if prev == "-1":
+        # Left over from a load that was killed before restoring it: not a setting to keep
+        prev = None
+    client.indices.put_settings(index=index_name, body={"index": {"refresh_interval": "-1"}})
+    try:
+        yield
+    finally:
+        # None resets the setting to the cluster default
+        client.indices.put_settings(index=index_name, body={"index": {"refresh_interval": prev}})
+        client.indices.refresh(index=index_name)
+
+class BulkIndexer:
+    """
+    Streams actions into bulk requests capped at `max_chunk_bytes` / `max_chunk_docs`
+    and keeps up to `workers` requests in flight. Items rejected with 429 (and
+    whole requests failing with 429/503/timeouts) are retried with jittered
+    exponential backoff. Only one request body per worker is held in memory.
+    Each completed request is reported (docs/s) and, with `events`, logged as a
+    "bulk_request" event.
+    """
+    def __init__(self, client, index_name: str, max_chunk_bytes: int = BULK_MAX_BYTES,
+                 max_chunk_docs: int = BULK_MAX_DOCS, workers: int = BULK_WORKERS,
+                 max_retries: int = 5, backoff_s: float = 1.0, events=None):
+        self.client = client
+        self.index_name = index_name
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_chunk_docs = max_chunk_docs
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.events = events
+        self.dumps = client.transport.serializer.dumps
+
+    def upsert(self, chunks) -> int:
+        return self.run(({"index": {"_index": self.index_name, "_id": ch["chunk_id"]}}, ch) for ch in chunks)
+
+    def delete(self, chunk_ids) -> int:
+        # Already gone is fine: the goal is that the id is not in the index
+        return self.run((({"delete": {"_index": self.index_name, "_id": cid}}, None) for cid in chunk_ids),
+                        ignore_status=(404,))
+
+    def run(self, actions, ignore_status=()) -> int:
+        """actions: iterable of (action header, source or None). Returns the number of successful items."""
+        n_ok, failed = 0, []
+        sends = bounded_map(lambda b: self._send(b[0], ignore_status), self._batches(actions), self.workers)
+        for (batch, n_bytes), fut, started in sends:
+            ok, errors = fut.result()
+            n_ok += ok
+            failed.extend(errors)
+            n_docs = len(batch)
+            dt = max((datetime.now() - started).total_seconds(), 1e-9)
+            print(f"Bulk: {n_docs} docs, {n_bytes / 1e6:.1f} MB in {dt:.2f}s ({n_docs / dt:.0f} docs/s)")
+            if self.events is not None:
+                self.events.log(None, "bulk_request", not errors, f"{len(errors)} failed" if errors else "",
+                                started_at=started, n_items=n_docs, n_bytes=n_bytes)
+        if failed:
+            raise RuntimeError(f"{len(failed)} bulk items failed: {failed[:3]}")
+        return n_ok
+
+    def _batches(self, actions):
+        """Serialise actions lazily into (newline-delimited bulk lines, encoded size), cut by bytes/docs."""
+        batch, size = [], 0
+        for header, source in actions:
+            line = self.dumps(header) + "\n" + (self.dumps(source) + "\n" if source is not None else "")
+            n = len(line.encode())
+            if batch and (size + n > self.max_chunk_bytes or len(batch) >= self.max_chunk_docs):
+                yield batch, size
+                batch, size = [], 0
+            batch.append(line)
+            size += n
+        if batch:
+            yield batch, size
+
+    def _send(self, batch, ignore_status):
+        """One bulk request, retrying rejected items. Returns (n_ok, [failed items])."""
+        n_ok, failed = 0, []
+        for attempt in range(self.max_retries + 1):
+            last = attempt == self.max_retries
+            try:
+                resp = self.client.bulk(body="".join(batch))
+            except TransportError as e:
+                if not _retryable(e) or last:
+                    raise
+                backoff_sleep(attempt, self.backoff_s)
+                continue
+            retry = []
+            for line, item in zip(batch, resp["items"]):
+                (_, result), = item.items()
+                status = result.get("status", 500)
+                if 200 <= status < 300 or status in ignore_status:
+                    n_ok += 1
+                elif status == 429 and not last:
+                    retry.append(line)
+                else:
+                    failed.append(result)
+            if not retry:
+                return n_ok, failed
+            batch = retry
+            backoff_sleep(attempt, self.backoff_s)
+        return n_ok, failed
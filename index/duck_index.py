@@ -1,40 +1,277 @@
 # rag/pipeline/index_pipeline.py
 import duckdb, time
+from contextlib import nullcontext
 from datetime import datetime
-from typing import List, Dict
-from rag.chunking import chunk_document
-from rag.embed import GeminiEmbedder
-from index.open_index import get_client, ensure_index, bulk_upsert_chunks
+from typing import List, Dict, Iterable, Iterator, Tuple
+from rag.chunking import chunk_page, MAX_TOKENS, MIN_TOKENS, OVERLAP_TOKENS
+from rag.embed import get_embedder
+from rag.embed_cache import EmbeddingCache, CachedEmbedder
+from rag.metrics import EventLog
+from rag.dedup import ChunkDeduper, DEDUP_THRESHOLD
+from index.open_index import get_client, ensure_index
+from index.bulk_indexer import BulkIndexer, bulk_load_settings
+from index.local_index import LocalVectorIndex
 
-def fetch_ready_pages(db_path: str, file_limit: int = 1000) -> List[Dict]:
-    con = duckdb.connect(db_path)
-    rows = con.execute("""
-        SELECT f.file_id, p.page_no, p.text
-        FROM pages p
-        JOIN files f ON f.file_id = p.file_id
-        WHERE p.text IS NOT NULL AND TRIM(p.text) <> ''
-    """).fetchall()
-    # Map to dicts
-    pages = [{"file_id": r[0], "page_no": r[1], "text": r[2]} for r in rows]
-    return pages
-
-def run_indexing(db_path: str, index_name="rag-chunks", embed_model="text-embedding-004", out_dim=768):
-    # 1) Gather pages from DuckDB and build chunks
-    pages = fetch_ready_pages(db_path)
-    chunks = chunk_document(pages)
-
-    # 2) Embed in mini-batches
-    embedder = GeminiEmbedder(model=embed_model, output_dim=out_dim)
-    B = 128
-    for i in range(0, len(chunks), B):
-        batch = chunks[i:i+B]
+def ensure_index_state(con):
+    """Per-page indexing state: pages columns, page_chunks, index_meta (created here only; schema.create_schema calls this)."""
+    con.execute("ALTER TABLE pages ADD COLUMN IF NOT EXISTS content_hash VARCHAR")
+    con.execute("ALTER TABLE pages ADD COLUMN IF NOT EXISTS indexed_version VARCHAR")
+    con.execute("ALTER TABLE pages ADD COLUMN IF NOT EXISTS indexed_at TIMESTAMP")
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS page_chunks (
+            page_id VARCHAR,
+            chunk_id VARCHAR
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS index_meta (
+            index_name VARCHAR PRIMARY KEY,
+            version BIGINT,
+            updated_at TIMESTAMP
+        )
+    """)
+
+def get_index_version(con, index_name: str) -> int:
+    """Counter bumped by every run_indexing that changed the index; keys query-side caches."""
+    ensure_index_state(con)
+    row = con.execute("SELECT version FROM index_meta WHERE index_name = ?", [index_name]).fetchone()
+    return row[0] if row else 0
+
+def bump_index_version(con, index_name: str):
+    con.execute("""
+        INSERT INTO index_meta (index_name, version, updated_at) VALUES (?, 1, now())
+        ON CONFLICT (index_name) DO UPDATE SET version = index_meta.version + 1, updated_at = now()
+    """, [index_name])
+
+CHUNK_FIELDS_VERSION = 3  # bump when fields stored per chunk change (2: uploaded_at, 3: char offsets)
+
+def index_version(index_name: str, embed_model: str, out_dim: int, dedup: str = None) -> str:
+    # Anything that changes chunk ids, vectors, stored fields or which chunks are kept forces a re-index of every page
+    version = f"{index_name}:{embed_model}:{out_dim}:{MAX_TOKENS}:{MIN_TOKENS}:{OVERLAP_TOKENS}:v{CHUNK_FIELDS_VERSION}"
+    return f"{version}:{dedup}" if dedup else version
+
+_READY_FILTER = """
+    (p.content_hash IS DISTINCT FROM md5(COALESCE(p.text, ''))
+     OR p.indexed_version IS DISTINCT FROM ?)
+    AND (TRIM(COALESCE(p.text, '')) <> ''
+         OR p.page_id IN (SELECT page_id FROM page_chunks))
+"""
+
+def iter_ready_pages(con, version: str = None, fetch_size: int = 1000) -> Iterator[Dict]:
+    """
+    Stream pages whose text changed (or that were never indexed) since the last run.
+    Pages that became empty are returned too when they still own chunks, so
+    their old chunks get removed from the index.
+
+    Walks the table in rowid windows so only `fetch_size` rows are held at once
+    and each window scan stays proportional to its size.
+    """
+    max_rowid = con.execute("SELECT max(rowid) FROM pages").fetchone()[0]
+    if max_rowid is None:
+        return
+    lo = 0
+    while lo <= max_rowid:
+        rows = con.execute(f"""
+            SELECT p.page_id, f.file_id, p.page_no, p.text, md5(COALESCE(p.text, '')) AS content_hash,
+                   f.uploaded_at
+            FROM pages p
+            JOIN files f ON f.file_id = p.file_id
+            WHERE p.rowid >= ? AND p.rowid < ? AND {_READY_FILTER}
+            ORDER BY p.rowid
+        """, [lo, lo + fetch_size, version]).fetchall()
+        for r in rows:
+            yield {"page_id": r[0], "file_id": r[1], "page_no": r[2], "text": r[3], "content_hash": r[4],
+                   "uploaded_at": r[5].isoformat() if r[5] else None}
+        lo += fetch_size
+
+def fetch_ready_pages(db_path: str, file_limit: int = 1000, version: str = None, con=None) -> List[Dict]:
+    con = con or duckdb.connect(db_path)
+    return list(iter_ready_pages(con, version=version))
+
+def iter_page_batches(pages: Iterable[Dict], max_chunks: int = 2048) -> Iterator[Tuple[List[Dict], List[Dict]]]:
+    """
+    Chunk pages and group them into (pages, chunks) batches of whole pages,
+    flushing once `max_chunks` chunks are pending (the high-water mark).
+    """
+    batch_pages, batch_chunks = [], []
+    for p in pages:
+        batch_pages.append(p)
+        for c in chunk_page(p["file_id"], p["page_no"], p["text"] or ""):
+            # Filterable alongside file_id/page_no at query time
+            c["uploaded_at"] = p.get("uploaded_at")
+            batch_chunks.append(c)
+        if len(batch_chunks) >= max_chunks:
+            yield batch_pages, batch_chunks
+            batch_pages, batch_chunks = [], []
+    if batch_pages:
+        yield batch_pages, batch_chunks
+
+def _stale_chunk_ids(con, pages: List[Dict], chunks: List[Dict]) -> List[str]:
+    """Chunk ids previously indexed for these pages that the new chunking no longer produces."""
+    if not pages:
+        return []
+    old = con.execute(
+        "SELECT chunk_id FROM page_chunks WHERE page_id IN (SELECT UNNEST(?::VARCHAR[]))",
+        [[p["page_id"] for p in pages]]
+    ).fetchall()
+    new = {c["chunk_id"] for c in chunks}
+    return [r[0] for r in old if r[0] not in new]
+
+def mark_pages_indexed(con, pages: List[Dict], chunks: List[Dict], version: str):
+    """Record which chunks each page produced and the text hash they were built from."""
+    page_ids = {(p["file_id"], p["page_no"]): p["page_id"] for p in pages}
+    con.execute("BEGIN TRANSACTION")
+    try:
+        con.execute(
+            "DELETE FROM page_chunks WHERE page_id IN (SELECT UNNEST(?::VARCHAR[]))",
+            [list(page_ids.values())]
+        )
+        if chunks:
+            con.executemany(
+                "INSERT INTO page_chunks (page_id, chunk_id) VALUES (?, ?)",
+                [(page_ids[(c["file_id"], c["page_no"])], c["chunk_id"]) for c in chunks]
+            )
+        con.executemany(
+            "UPDATE pages SET content_hash = ?, indexed_version = ?, indexed_at = now() WHERE page_id = ?",
+            [(p["content_hash"], version, p["page_id"]) for p in pages]
+        )
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+
+def _embed_chunks(embedder, chunks: List[Dict], batch_size: int):
+    created_at = datetime.utcnow().isoformat()
+    for i in range(0, len(chunks), batch_size):
+        batch = chunks[i:i+batch_size]
         vecs = embedder.embed([c["text"] for c in batch])
         for c, v in zip(batch, vecs):
             c["embedding"] = v
-            c["created_at"] = datetime.utcnow().isoformat()
+            c["created_at"] = created_at
+
+def run_indexing(db_path: str, index_name="rag-chunks", embed_model=None, out_dim=768,
+                 max_pending_chunks: int = 2048, fetch_size: int = 1000, embed_batch: int = 128,
+                 use_embed_cache: bool = True, embed_cache_max_bytes: int = None,
+                 embed_backend: str = "gemini", embed_opts: dict = None, embedder=None,
+                 local_index_dir: str = None, client=None, bulk_opts: dict = None,
+                 dedup_threshold: float = DEDUP_THRESHOLD, dedup_scope: str = "file", progress=None):
+    """
+    Streaming pipeline: page cursor -> chunk -> embed batch -> index batch.
+    At most `max_pending_chunks` chunks (plus one page's worth) are held in
+    memory at a time, however large the corpus is.
+
+    With `use_embed_cache`, vectors are looked up in the DuckDB embedding cache
+    first and only misses go to the API; `embed_cache_max_bytes` trims the
+    cache (LRU) at the end of the run.
+
+    `embed_backend` ("gemini", "hashing", "onnx") picks the embedder, with
+    `embed_model=None` meaning the backend's default model; alternatively pass
+    a ready `embedder`. Queries must be embedded with the same backend.
+
+    With `local_index_dir`, chunks go to a LocalVectorIndex on disk instead of
+    OpenSearch; otherwise `client` (default: get_client()) is the OpenSearch client,
+    loaded through a BulkIndexer (`bulk_opts`: max_chunk_bytes, workers, ...)
+    with refresh switched off until the run ends.
+
+    With `dedup_threshold` set (None = off), chunks that are near-duplicates
+    (MinHash estimate) of an already indexed chunk are neither embedded nor
+    indexed; they are recorded as aliases of it (see rag.dedup.ChunkDeduper,
+    `dedup_scope` "file" or "global").
+
+    `progress(stage, file_ids)` is called per batch as its files reach
+    "chunking" and "embedding" (the job queue reports it to the UI).
+    """
+    con = duckdb.connect(db_path)
+    ensure_index_state(con)
+    events = EventLog(con)
+    if embedder is None:
+        embedder = get_embedder(embed_backend, model=embed_model, output_dim=out_dim, **(embed_opts or {}))
+    if local_index_dir:
+        index_name = f"local:{local_index_dir}"
+    deduper = ChunkDeduper(con, dedup_threshold, scope=dedup_scope) if dedup_threshold else None
+    version = index_version(index_name, embedder.model, out_dim, deduper.config if deduper else None)
+
+    if use_embed_cache:
+        embedder = CachedEmbedder(embedder, EmbeddingCache(con, embedder.model, out_dim))
+    if local_index_dir:
+        local = LocalVectorIndex(local_index_dir, dim=out_dim)
+        upsert, delete = local.upsert_chunks, local.delete_chunks
+        loading = nullcontext()
+    else:
+        client = client or get_client()
+        ensure_index(client, index_name=index_name, dim=out_dim)
+        bulk = BulkIndexer(client, index_name, events=events, **(bulk_opts or {}))
+        upsert, delete = bulk.upsert, bulk.delete
+        loading = bulk_load_settings(client, index_name)
+
+    n_pages = n_chunks = n_stale = 0
+    dedup_s = 0.0
+    t0 = time.perf_counter()
+    with loading:
+        while True:
+            requeued = 0
+            pages = iter_ready_pages(con, version=version, fetch_size=fetch_size)
+            batch_started = datetime.now()
+            for batch_pages, batch_chunks in iter_page_batches(pages, max_chunks=max_pending_chunks):
+                # Time spent in the generator: page fetch + chunking for this batch
+                n_bytes = sum(len(c["text"].encode()) for c in batch_chunks)
+                events.log(None, "chunk", True, started_at=batch_started, n_items=len(batch_chunks), n_bytes=n_bytes)
+                file_ids = {p["file_id"] for p in batch_pages}
+                if progress:
+                    progress("chunking", file_ids)
+
+                # Chunks its pages no longer produce; dropped from the index below
+                stale = _stale_chunk_ids(con, batch_pages, batch_chunks)
+                to_index, dropped = batch_chunks, []
+                if deduper:
+                    with events.span("dedup", n_items=len(batch_chunks), n_bytes=n_bytes) as span:
+                        d0 = time.perf_counter()
+                        requeued += deduper.forget(stale, [p["page_id"] for p in batch_pages])
+                        to_index, aliases = deduper.dedupe(batch_chunks)
+                        # Newly found duplicates may have been indexed by an earlier run
+                        dropped = [a[0] for a in aliases if a[4] is not None]
+                        dedup_s += time.perf_counter() - d0
+                        span.message = f"{len(aliases)} duplicates"
+
+                if progress:
+                    progress("embedding", file_ids)
+                with events.span("embed", n_items=len(to_index)):
+                    _embed_chunks(embedder, to_index, embed_batch)
+
+                with events.span("bulk_index", n_items=len(to_index) + len(stale) + len(dropped)):
+                    upsert(to_index)
+                    delete(stale + dropped)
+                if deduper:
+                    deduper.save()
+
+                # Only now remember the pages as indexed, so a failed run is retried
+                mark_pages_indexed(con, batch_pages, batch_chunks, version)
+
+                n_pages += len(batch_pages); n_chunks += len(to_index); n_stale += len(stale)
+                elapsed = max(time.perf_counter() - t0, 1e-9)
+                print(f"Indexed {n_pages} pages / {n_chunks} chunks "
+                      f"({n_pages / elapsed:.1f} pages/s, {n_chunks / elapsed:.1f} chunks/s)")
+                batch_started = datetime.now()
+            if not requeued:
+                break
+            # Their chunks pointed at canonicals that were just removed; one of them takes over
+            print(f"Re-indexing {requeued} pages whose duplicate chunks lost their canonical chunk")
+
+    if use_embed_cache and embed_cache_max_bytes is not None:
+        evicted = embedder.cache.evict(embed_cache_max_bytes)
+        if evicted:
+            print(f"Evicted {evicted} cached embeddings")
 
-    # 3) Index to OpenSearch
-    client = get_client()
-    ensure_index(client, index_name=index_name, dim=out_dim)
-    bulk_upsert_chunks(client, index_name, chunks)
-    return len(chunks)
+    events.close()
+    if not n_pages:
+        print("✅ Index up to date.")
+        return 0
+    bump_index_version(con, index_name)
+    elapsed = time.perf_counter() - t0
+    print(f"Indexed {n_pages} changed pages in {elapsed:.1f}s: {n_chunks} chunks upserted, {n_stale} stale chunks removed")
+    if use_embed_cache:
+        print(f"Embedding cache: {embedder.hits} hits, {embedder.misses} misses")
+    if deduper:
+        print(f"Dedup: {deduper.duplicates}/{deduper.seen} chunks were near-duplicates "
+              f"({deduper.ratio():.0%}), {dedup_s:.2f}s")
+    return n_chunks
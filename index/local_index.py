@@ -0,0 +1,293 @@
+import os
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict
+import numpy as np
+
+ID_WIDTH = 64          # chunk ids are sha256 hex digests
+SCAN_BLOCK = 65536     # rows scored per block in exact search
+IVF_MIN_ROWS = 50000   # below this, exact search is as fast as probing
+
+def _epoch(v) -> int:
+    if v is None:
+        return -1
+    if isinstance(v, str):
+        v = datetime.fromisoformat(v)
+    return int(v.timestamp())
+
+class LocalVectorIndex:
+    """
+    In-process vector index over the chunk records run_indexing produces, a
+    drop-in for OpenSearchRetriever (same `retrieve(query_vec)` contract).
+
+    Everything lives in flat files under `path`:
+      vectors.f32   L2-normalised float32 rows (memory-mapped, never loaded whole)
+      docs.jsonl    chunk metadata/text, one line per row; offsets.u64 points into it
+      ids.bin       fixed-width chunk ids; alive.u8 tombstones for upserts/deletes
+      file_ix.i32, page_no.i32, uploaded.i64
+                    filter columns (file ordinal into files.json, page, upload epoch)
+      ivf_*.npy/i32 optional IVF centroids and row->list assignments
+      meta.json     dim and committed row count, replaced atomically after each append
+    Opening is O(1): only meta.json is read, the rest is mmapped on demand.
+    """
+    def __init__(self, path: str, dim: int = None, k: int = 6, nprobe: int = 8):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.k = k
+        self.nprobe = nprobe
+        meta = self._read_meta()
+        if meta:
+            if dim is not None and dim != meta["dim"]:
+                raise ValueError(f"Index at {path} has dim {meta['dim']}, not {dim}")
+            self.dim, self.count, self.docs_bytes = meta["dim"], meta["count"], meta["docs_bytes"]
+        else:
+            if dim is None:
+                raise ValueError(f"No index at {path}; pass dim to create one")
+            self.dim, self.count, self.docs_bytes = dim, 0, 0
+            self._write_meta()
+        self._ids = None  # chunk_id -> row, built lazily for upserts/deletes
+        self._maps = {}
+        self._centroids = None
+        self._files = None  # file_id -> ordinal, from files.json
+
+    # -----------------------------
+    # Files
+    # -----------------------------
+    def _file(self, name):
+        return self.path / name
+
+    def _read_meta(self):
+        p = self._file("meta.json")
+        return json.loads(p.read_text()) if p.exists() else None
+
+    def _write_meta(self):
+        tmp = self._file("meta.json.tmp")
+        tmp.write_text(json.dumps({"dim": self.dim, "count": self.count, "docs_bytes": self.docs_bytes}))
+        os.replace(tmp, self._file("meta.json"))
+
+    def _map(self, name, dtype, width=1, mode="r"):
+        """Memmap of the committed rows of a per-row file (cached until the next append)."""
+        key = (name, mode)
+        if key not in self._maps:
+            if self.count == 0 or not self._file(name).exists():
+                return None
+            shape = (self.count, width) if width > 1 else (self.count,)
+            self._maps[key] = np.memmap(self._file(name), dtype=dtype, mode=mode, shape=shape)
+        return self._maps[key]
+
+    @property
+    def ivf_trained(self):
+        return self._file("ivf_centroids.npy").exists()
+
+    # -----------------------------
+    # Writes
+    # -----------------------------
+    def _row_ids(self) -> Dict[str, int]:
+        if self._ids is None:
+            ids = self._map("ids.bin", f"S{ID_WIDTH}")
+            alive = self._map("alive.u8", np.uint8)
+            self._ids = {} if ids is None else {
+                ids[row].decode().rstrip(): int(row) for row in np.flatnonzero(alive == 1)
+            }
+        return self._ids
+
+    def upsert_chunks(self, chunks_with_vecs: List[Dict]):
+        """Append chunk records (with 'embedding'); rows with the same chunk_id are superseded."""
+        if not chunks_with_vecs:
+            return
+        self.delete_chunks([c["chunk_id"] for c in chunks_with_vecs])
+
+        vecs = np.asarray([c["embedding"] for c in chunks_with_vecs], dtype=np.float32)
+        if vecs.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dim vectors, got {vecs.shape[1]}")
+        vecs /= np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+
+        docs, offsets, off = [], [], self.docs_bytes
+        for c in chunks_with_vecs:
+            line = (json.dumps({k: v for k, v in c.items() if k != "embedding"}) + "\n").encode()
+            offsets.append(off)
+            off += len(line)
+            docs.append(line)
+        ids = np.array([c["chunk_id"].ljust(ID_WIDTH).encode() for c in chunks_with_vecs], dtype=f"S{ID_WIDTH}")
+        file_ix = np.array([self._file_ord(c["file_id"], create=True) for c in chunks_with_vecs], dtype=np.int32)
+        page_no = np.array([c.get("page_no") or 0 for c in chunks_with_vecs], dtype=np.int32)
+        uploaded = np.array([_epoch(c.get("uploaded_at")) for c in chunks_with_vecs], dtype=np.int64)
+
+        self._maps.clear()
+        n = self.count
+        # Cut any rows a crashed append left behind, then append and commit via meta.json
+        self._append("vectors.f32", n * self.dim * 4, vecs.tobytes())
+        self._append("docs.jsonl", self.docs_bytes, b"".join(docs))
+        self._append("offsets.u64", n * 8, np.asarray(offsets, dtype=np.uint64).tobytes())
+        self._append("alive.u8", n, np.ones(len(ids), dtype=np.uint8).tobytes())
+        self._append("ids.bin", n * ID_WIDTH, ids.tobytes())
+        self._append("file_ix.i32", n * 4, file_ix.tobytes())
+        self._append("page_no.i32", n * 4, page_no.tobytes())
+        self._append("uploaded.i64", n * 8, uploaded.tobytes())
+        self._write_files()
+        if self.ivf_trained:
+            self._append("ivf_assign.i32", n * 4, self._assign(vecs).tobytes())
+
+        self.count, self.docs_bytes = n + len(ids), off
+        self._write_meta()
+        if self._ids is not None:
+            for i, c in enumerate(chunks_with_vecs):
+                self._ids[c["chunk_id"]] = n + i
+
+    def _append(self, name, committed_bytes, data: bytes):
+        with open(self._file(name), "ab") as f:
+            f.truncate(committed_bytes)
+            f.write(data)
+
+    def _file_ord(self, file_id, create=False):
+        if self._files is None:
+            p = self._file("files.json")
+            self._files = {f: i for i, f in enumerate(json.loads(p.read_text()))} if p.exists() else {}
+        if create and file_id not in self._files:
+            self._files[file_id] = len(self._files)
+        return self._files.get(file_id)
+
+    def _write_files(self):
+        tmp = self._file("files.json.tmp")
+        tmp.write_text(json.dumps(sorted(self._files, key=self._files.get)))
+        os.replace(tmp, self._file("files.json"))
+
+    def delete_chunks(self, chunk_ids: List[str]):
+        rows = [r for r in (self._row_ids().get(cid) for cid in chunk_ids) if r is not None]
+        if rows:
+            alive = self._map("alive.u8", np.uint8, mode="r+")
+            alive[rows] = 0
+            alive.flush()
+            for cid in chunk_ids:
+                self._ids.pop(cid, None)
+
+    # -----------------------------
+    # IVF (approximate mode)
+    # -----------------------------
+    def train_ivf(self, nlist: int = None, sample: int = 100000, iters: int = 10, seed: int = 0):
+        """Spherical k-means on a sample of rows, then assign every row to its nearest list."""
+        vecs = self._map("vectors.f32", np.float32, self.dim)
+        if vecs is None:
+            raise ValueError("Cannot train IVF on an empty index")
+        nlist = nlist or int(np.clip(np.sqrt(self.count), 1, 4096))
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(self.count, size=min(sample, self.count), replace=False))
+        x = np.asarray(vecs[sample_rows])
+        centroids = x[rng.choice(len(x), size=min(nlist, len(x)), replace=False)].copy()
+        for _ in range(iters):
+            assign = np.argmax(x @ centroids.T, axis=1)
+            for j in range(len(centroids)):
+                members = x[assign == j]
+                c = members.sum(axis=0) if len(members) else x[rng.integers(len(x))]
+                centroids[j] = c / max(np.linalg.norm(c), 1e-12)
+        np.save(self._file("ivf_centroids.npy"), centroids)
+        self._centroids = centroids
+
+        self._maps.clear()
+        with open(self._file("ivf_assign.i32"), "wb") as f:
+            for a in range(0, self.count, SCAN_BLOCK):
+                f.write(self._assign(np.asarray(vecs[a:a+SCAN_BLOCK])).tobytes())
+
+    def _load_centroids(self):
+        if self._centroids is None:
+            self._centroids = np.load(self._file("ivf_centroids.npy"))
+        return self._centroids
+
+    def _assign(self, vecs):
+        return np.argmax(vecs @ self._load_centroids().T, axis=1).astype(np.int32)
+
+    # -----------------------------
+    # Search
+    # -----------------------------
+    def _filter_mask(self, file_ids=None, uploaded_after=None, uploaded_before=None, page_from=None, page_to=None):
+        """Same filters as index.open_index.build_knn_filter, evaluated on the column files."""
+        mask = np.ones(self.count, dtype=bool)
+        if file_ids:
+            col = self._column("file_ix.i32", np.int32)
+            ords = [o for o in (self._file_ord(f) for f in file_ids) if o is not None]
+            mask &= np.isin(col, ords)
+        if uploaded_after is not None or uploaded_before is not None:
+            col = self._column("uploaded.i64", np.int64)
+            mask &= col >= max(_epoch(uploaded_after), 0)
+            if uploaded_before is not None:
+                mask &= col <= _epoch(uploaded_before)
+        if page_from is not None or page_to is not None:
+            col = self._column("page_no.i32", np.int32)
+            if page_from is not None:
+                mask &= col >= page_from
+            if page_to is not None:
+                mask &= col <= page_to
+        return mask
+
+    def _column(self, name, dtype):
+        col = self._map(name, dtype)
+        if col is None:
+            raise ValueError(f"{self.path} has no {name}; rebuild the index to use filters")
+        return col
+
+    def search(self, query_vec, k: int = None, mode: str = "auto", nprobe: int = None, filters=None) -> List[Dict]:
+        """
+        Top-k chunk records by cosine similarity, each with a `score`.
+        mode: "exact" (blocked brute force), "ivf" (probe `nprobe` lists) or "auto".
+        filters: as for OpenSearchRetriever.retrieve; applied before scoring.
+        """
+        k = k or self.k
+        vecs = self._map("vectors.f32", np.float32, self.dim)
+        if vecs is None:
+            return []
+        q = np.asarray(query_vec, dtype=np.float32)
+        q /= max(np.linalg.norm(q), 1e-12)
+        alive = self._map("alive.u8", np.uint8)
+        if mode == "auto":
+            mode = "ivf" if self.ivf_trained and self.count >= IVF_MIN_ROWS else "exact"
+
+        keep = self._filter_mask(**filters) if filters else None
+        if mode == "ivf":
+            assign = self._map("ivf_assign.i32", np.int32)
+            probes = np.argsort(self._load_centroids() @ q)[-(nprobe or self.nprobe):]
+            keep = np.isin(assign, probes) if keep is None else keep & np.isin(assign, probes)
+
+        gather = keep is not None
+        if gather:
+            candidates = np.flatnonzero(keep & (alive == 1))
+            blocks = (candidates[i:i+SCAN_BLOCK] for i in range(0, len(candidates), SCAN_BLOCK))
+        else:
+            blocks = (np.arange(a, min(a + SCAN_BLOCK, self.count)) for a in range(0, self.count, SCAN_BLOCK))
+
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for rows in blocks:
+            if gather:
+                scores = np.asarray(vecs[rows]) @ q
+            else:
+                scores = np.asarray(vecs[rows[0]:rows[-1] + 1]) @ q
+                scores[alive[rows[0]:rows[-1] + 1] == 0] = -np.inf
+            rows = np.concatenate([best_rows, rows])
+            scores = np.concatenate([best_scores, scores])
+            if len(scores) > k:
+                top = np.argpartition(-scores, k)[:k]
+                rows, scores = rows[top], scores[top]
+            best_rows, best_scores = rows, scores
+
+        order = np.argsort(-best_scores)
+        return [dict(self._doc(int(best_rows[i])), score=float(best_scores[i]))
+                for i in order if np.isfinite(best_scores[i])]
+
+    def _doc(self, row: int) -> Dict:
+        offsets = self._map("offsets.u64", np.uint64)
+        with open(self._file("docs.jsonl"), "rb") as f:
+            f.seek(int(offsets[row]))
+            return json.loads(f.readline())
+
+    def retrieve_hits(self, query_vec, filters=None):
+        return self.search(query_vec, self.k, filters=filters)
+
+    def retrieve_many(self, query_vecs, filters=None, k: int = None):
+        """Same contract as OpenSearchRetriever.retrieve_many (searches run in-process, one by one)."""
+        per_query = filters if isinstance(filters, list) else [filters] * len(query_vecs)
+        return [self.search(q, k or self.k, filters=f) for q, f in zip(query_vecs, per_query)]
+
+    def retrieve(self, query_vec, filters=None):
+        # Same contract as OpenSearchRetriever.retrieve: list of text chunks
+        return [hit["text"] for hit in self.search(query_vec, self.k, filters=filters)]
@@ -1,6 +1,8 @@
-from opensearchpy import OpenSearch, helpers
+from opensearchpy import OpenSearch
 import time
 
+FILTERED_KNN_ENGINES = ("lucene", "faiss")  # engines that support the knn clause's pre-filter
+
 def get_client():
     
     return OpenSearch(
@@ -12,7 +14,8 @@ def get_client():
         timeout=60
     )
 
-def ensure_index(client, index_name="rag-chunks", dim=768, ef_search=128, m=16, engine="nmslib"):
+def ensure_index(client, index_name="rag-chunks", dim=768, ef_search=128, m=16, engine="lucene"):
+    # lucene (or faiss) is required for efficient pre-filtered kNN; nmslib can only post-filter
     body = {
         "settings": {
             "index": {
@@ -27,8 +30,11 @@ def ensure_index(client, index_name="rag-chunks", dim=768, ef_search=128, m=16,
                 "page_no": {"type": "integer"},
                 "ord": {"type": "integer"},
                 "n_tokens": {"type": "integer"},
+                "char_start": {"type": "integer"},
+                "char_end": {"type": "integer"},
                 "text": {"type": "text"},
                 "created_at": {"type": "date"},
+                "uploaded_at": {"type": "date"},
                 "embedding": {
                     "type": "knn_vector",
                     "dimension": dim,
@@ -44,29 +50,62 @@ def ensure_index(client, index_name="rag-chunks", dim=768, ef_search=128, m=16,
     }
     if not client.indices.exists(index=index_name):
         client.indices.create(index=index_name, body=body)
+        return
+    # An existing index keeps its mapping; re-indexing into an nmslib one would cost
+    # a full pass and still leave file-scoped (filtered kNN) search failing
+    existing = knn_engine(client, index_name)
+    if existing not in FILTERED_KNN_ENGINES:
+        raise RuntimeError(
+            f"Index '{index_name}' uses the {existing} kNN engine, which cannot pre-filter kNN queries. "
+            f"Delete it (DELETE /{index_name}) or pass a new index_name so it is recreated with engine={engine}."
+        )
+
+def knn_engine(client, index_name):
+    """Engine of an existing index's `embedding` field (nmslib when the mapping doesn't say)."""
+    mapping = next(iter(client.indices.get_mapping(index=index_name).values()))["mappings"]
+    method = mapping.get("properties", {}).get("embedding", {}).get("method", {})
+    return method.get("engine", "nmslib")
+
+def _iso(v):
+    return v.isoformat() if hasattr(v, "isoformat") else v
+
+def build_knn_filter(file_ids=None, uploaded_after=None, uploaded_before=None, page_from=None, page_to=None):
+    """
+    Structured retrieval scope -> bool filter for the knn clause, or None if unscoped.
+    Dates may be datetimes or ISO strings; page bounds are inclusive.
+    """
+    clauses = []
+    if file_ids:
+        clauses.append({"terms": {"file_id": list(file_ids)}})
+    if uploaded_after is not None or uploaded_before is not None:
+        rng = {}
+        if uploaded_after is not None:
+            rng["gte"] = _iso(uploaded_after)
+        if uploaded_before is not None:
+            rng["lte"] = _iso(uploaded_before)
+        clauses.append({"range": {"uploaded_at": rng}})
+    if page_from is not None or page_to is not None:
+        rng = {}
+        if page_from is not None:
+            rng["gte"] = page_from
+        if page_to is not None:
+            rng["lte"] = page_to
+        clauses.append({"range": {"page_no": rng}})
+    return {"bool": {"filter": clauses}} if clauses else None
 
-def bulk_upsert_chunks(client, index_name, chunks_with_vecs):
-    actions = []
-    for ch in chunks_with_vecs:
-        actions.append({
-            "_op_type": "index",
-            "_index": index_name,
-            "_id": ch["chunk_id"],
-            "_source": ch
-        })
-    helpers.bulk(client, actions)
+def knn_query(query_vec, k, filters=None):
+    knn = {"vector": query_vec, "k": k}
+    knn_filter = build_knn_filter(**(filters or {}))
+    if knn_filter:
+        # Inside the knn clause = pre-filtering during the HNSW search (lucene/faiss
+        # engines), so k results come back from the scoped set, not k minus misses
+        knn["filter"] = knn_filter
+    return {"knn": {"embedding": knn}}
 
-def knn_search(client, index_name, query_vec, k=8, min_score=None):
+def knn_search(client, index_name, query_vec, k=8, min_score=None, filters=None):
     q = {
         "size": k,
-        "query": {
-            "knn": {
-                "embedding": {
-                    "vector": query_vec,
-                    "k": k
-                }
-            }
-        }
+        "query": knn_query(query_vec, k, filters)
     }
     if min_score is not None:
         # (Optional) radial search style thresholding
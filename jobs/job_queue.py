@@ -0,0 +1,194 @@
+# Persistent ingest job queue: one row per uploaded file, moved through STAGES by jobs.worker.
+# It lives in its own DuckDB file next to the main DB, so the UI can enqueue and poll
+# progress while the worker holds the main DB for the length of a batch.
+import os
+import uuid
+from contextlib import contextmanager
+
+from schema import connect
+
+STAGES = ("queued", "parsing", "ocr", "chunking", "embedding", "indexed", "failed")
+ACTIVE_STAGES = ("parsing", "ocr", "chunking", "embedding")
+HEARTBEAT_S = 5.0         # worker liveness update interval
+WORKER_TIMEOUT_S = 30.0   # a worker silent for this long is presumed dead
+MAX_ATTEMPTS = 3          # jobs interrupted by a dead worker are retried up to this often
+
+def jobs_db_path(db_path: str) -> str:
+    """Queue file for a main DB: rag_demo.duckdb -> rag_demo.jobs.duckdb"""
+    root, _ = os.path.splitext(db_path)
+    return root + ".jobs.duckdb"
+
+
+class JobQueue:
+    """
+    Every call opens the queue file for one short transaction (waiting out
+    DuckDB's one-process-per-file lock) and closes it again, so the UI
+    processes and the worker can all share it.
+    """
+    def __init__(self, path: str, timeout_s: float = 30.0):
+        self.path = path
+        self.timeout_s = timeout_s
+        with self._tx() as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS ingest_jobs (
+                    job_id VARCHAR PRIMARY KEY,
+                    file_id VARCHAR,
+                    file_name VARCHAR,
+                    path VARCHAR,
+                    content_hash VARCHAR,
+                    stage VARCHAR,
+                    message TEXT,
+                    pages INTEGER,
+                    duplicate_of VARCHAR,
+                    attempts INTEGER DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT now(),
+                    updated_at TIMESTAMP DEFAULT now()
+                )
+            """)
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS job_workers (
+                    pid INTEGER,
+                    heartbeat TIMESTAMP
+                )
+            """)
+
+    @contextmanager
+    def _tx(self):
+        con = connect(self.path, timeout_s=self.timeout_s)
+        try:
+            con.execute("BEGIN TRANSACTION")
+            try:
+                yield con
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+        finally:
+            con.close()
+
+    def enqueue(self, file_id: str, file_name: str, path: str, content_hash: str) -> str:
+        job_id = str(uuid.uuid4())
+        with self._tx() as con:
+            con.execute("""
+                INSERT INTO ingest_jobs (job_id, file_id, file_name, path, content_hash, stage)
+                VALUES (?, ?, ?, ?, ?, 'queued')
+            """, [job_id, file_id, file_name, str(path), content_hash])
+        return job_id
+
+    def find_by_hash(self, content_hash: str):
+        """(file_id, file_name, stage) of a queued, running or finished job with these bytes, or None. Failed jobs don't count."""
+        with self._tx() as con:
+            return con.execute("""
+                SELECT coalesce(duplicate_of, file_id), file_name, stage FROM ingest_jobs
+                WHERE content_hash = ? AND stage != 'failed'
+                ORDER BY created_at
+                LIMIT 1
+            """, [content_hash]).fetchone()
+
+    def claim(self, limit: int):
+        """Move up to `limit` queued jobs (oldest first) to 'parsing' and return them as dicts."""
+        with self._tx() as con:
+            rows = con.execute("""
+                SELECT job_id, file_id, file_name, path, content_hash FROM ingest_jobs
+                WHERE stage = 'queued'
+                ORDER BY created_at
+                LIMIT ?
+            """, [limit]).fetchall()
+            if rows:
+                con.execute("""
+                    UPDATE ingest_jobs SET stage = 'parsing', attempts = attempts + 1, updated_at = now()
+                    WHERE job_id IN (SELECT UNNEST(?::VARCHAR[]))
+                """, [[r[0] for r in rows]])
+        return [dict(zip(("job_id", "file_id", "file_name", "path", "content_hash"), r)) for r in rows]
+
+    def advance(self, job_ids, stage: str, message: str = None, pages: int = None):
+        """
+        Move jobs forward to `stage`. Stages never go backwards (a file whose
+        pages span several index batches stays at its furthest stage) and
+        'indexed'/'failed' are final.
+        """
+        if not job_ids:
+            return
+        with self._tx() as con:
+            con.execute("""
+                UPDATE ingest_jobs
+                SET stage = ?, message = coalesce(?, message), pages = coalesce(?, pages), updated_at = now()
+                WHERE job_id IN (SELECT UNNEST(?::VARCHAR[]))
+                  AND stage NOT IN ('indexed', 'failed')
+                  AND list_position(?::VARCHAR[], stage) < list_position(?::VARCHAR[], ?)
+            """, [stage, message, pages, list(job_ids), list(STAGES), list(STAGES), stage])
+
+    def mark_duplicate(self, job_id: str, file_id: str, file_name: str):
+        """Finish a job whose bytes the main DB already holds as `file_id`."""
+        with self._tx() as con:
+            con.execute("""
+                UPDATE ingest_jobs
+                SET stage = 'indexed', duplicate_of = ?, message = ?, updated_at = now()
+                WHERE job_id = ?
+            """, [file_id, f"Same content as {file_name}", job_id])
+
+    def recover(self) -> int:
+        """Requeue jobs a dead worker left mid-flight (or fail them after MAX_ATTEMPTS)."""
+        with self._tx() as con:
+            n = con.execute(f"""
+                SELECT count(*) FROM ingest_jobs WHERE stage IN {ACTIVE_STAGES}
+            """).fetchone()[0]
+            con.execute(f"""
+                UPDATE ingest_jobs
+                SET stage = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                    message = CASE WHEN attempts >= ? THEN 'Interrupted too often' ELSE message END,
+                    updated_at = now()
+                WHERE stage IN {ACTIVE_STAGES}
+            """, [MAX_ATTEMPTS, MAX_ATTEMPTS])
+        return n
+
+    def register_worker(self, pid: int) -> bool:
+        """Claim the single worker slot; False if another live worker holds it."""
+        with self._tx() as con:
+            live = con.execute("""
+                SELECT count(*) FROM job_workers
+                WHERE pid != ? AND heartbeat > now() - to_seconds(?)
+            """, [pid, WORKER_TIMEOUT_S]).fetchone()[0]
+            if live:
+                return False
+            con.execute("DELETE FROM job_workers")
+            con.execute("INSERT INTO job_workers VALUES (?, now())", [pid])
+        return True
+
+    def heartbeat(self, pid: int):
+        with self._tx() as con:
+            con.execute("UPDATE job_workers SET heartbeat = now() WHERE pid = ?", [pid])
+
+    def unregister_worker(self, pid: int):
+        with self._tx() as con:
+            con.execute("DELETE FROM job_workers WHERE pid = ?", [pid])
+
+    def worker_alive(self) -> bool:
+        with self._tx() as con:
+            return con.execute(
+                "SELECT count(*) FROM job_workers WHERE heartbeat > now() - to_seconds(?)", [WORKER_TIMEOUT_S]
+            ).fetchone()[0] > 0
+
+    def counts(self):
+        """{stage: n_jobs}"""
+        with self._tx() as con:
+            return dict(con.execute("SELECT stage, count(*) FROM ingest_jobs GROUP BY stage").fetchall())
+
+    def recent(self, limit: int = 20):
+        """Latest jobs as a DataFrame for the progress table."""
+        with self._tx() as con:
+            return con.execute("""
+                SELECT file_name, stage, pages, message, created_at, updated_at
+                FROM ingest_jobs
+                ORDER BY created_at DESC
+                LIMIT ?
+            """, [limit]).fetchdf()
+
+    def indexed_files(self):
+        """(file_id, file_name, created_at) of files indexed through the queue."""
+        with self._tx() as con:
+            return con.execute("""
+                SELECT file_id, file_name, created_at FROM ingest_jobs
+                WHERE stage = 'indexed' AND duplicate_of IS NULL
+                ORDER BY created_at DESC
+            """).fetchall()
@@ -0,0 +1,182 @@
+# Background ingest worker: drains the job queue (parse -> OCR -> chunk/embed/index).
+# Usage: python -m jobs.worker <db_path> [--embed-backend gemini] [--local-index-dir DIR] [--once]
+import argparse
+import multiprocessing as mp
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from schema import connect, create_schema
+from jobs.job_queue import JobQueue, jobs_db_path, HEARTBEAT_S
+
+POLL_S = 2.0        # idle wait between queue checks
+BATCH_FILES = 16    # files per batch: parsed together by the process pool, indexed in one run
+OCR_PAGES = 64      # pages per GeminiBatchOCR.process call
+MAIN_DB_WAIT_S = 120.0  # how long a batch waits for UI readers to let go of the main DB
+
+def _run_batch(db_path, jobs_db, jobs, ocr, ocr_opts, index_opts, parse_workers):
+    """
+    Batch process: the only writer of the main DB while it runs. Its first
+    connection is held until exit, so the pipeline's own connections reuse
+    the open database instead of racing the UI for the file lock.
+    """
+    from parsers.ingest import ingest_files
+    from parsers.ocr import GeminiBatchOCR
+    from parsers.uploads import ensure_file_hash_column, find_file_by_hash, register_file
+    from index.duck_index import run_indexing
+    from rag.metrics import EventLog
+
+    queue = JobQueue(jobs_db)
+    con = connect(db_path, timeout_s=MAIN_DB_WAIT_S)
+    create_schema(con)
+    ensure_file_hash_column(con)
+    events = EventLog(con)
+
+    job_of, seen = {}, {}
+    for job in jobs:
+        # Same bytes as a file already ingested (or earlier in this batch): reuse its pages and chunks
+        known = find_file_by_hash(con, job["content_hash"]) or seen.get(job["content_hash"])
+        if known:
+            Path(job["path"]).unlink(missing_ok=True)
+            events.log(known[0], "upload_duplicate", True, f"{job['file_name']} matches {known[1]}")
+            queue.mark_duplicate(job["job_id"], *known)
+            continue
+        register_file(con, job["file_id"], job["path"], job["content_hash"])
+        seen[job["content_hash"]] = (job["file_id"], job["file_name"])
+        job_of[job["file_id"]] = job["job_id"]
+    events.flush()
+    if not job_of:
+        return
+
+    parsed = []
+    files = [(job["file_id"], job["path"]) for job in jobs if job["file_id"] in job_of]
+    for file_id, (n_pages, err) in ingest_files(db_path, files, workers=parse_workers).items():
+        if err:
+            queue.advance([job_of[file_id]], "failed", f"Parse error: {err}")
+        else:
+            queue.advance([job_of[file_id]], "ocr", f"Parsed {n_pages} pages", pages=n_pages)
+            parsed.append(job_of[file_id])
+    if not parsed:
+        return
+
+    def progress(stage, file_ids):
+        queue.advance([job_of[f] for f in file_ids if f in job_of], stage)
+
+    try:
+        if ocr:
+            ocr_engine = GeminiBatchOCR(db_path, **(ocr_opts or {}))
+            # Every pass completes its pages or counts a failed attempt against them,
+            # so this ends even when some pages never OCR (they are given up on)
+            while ocr_engine.pending_count():
+                ocr_engine.process(batch_limit=OCR_PAGES)
+        n_chunks = run_indexing(db_path, progress=progress, **(index_opts or {}))
+    except Exception as e:
+        queue.advance(parsed, "failed", f"{type(e).__name__}: {e}")
+        raise
+    queue.advance(parsed, "indexed", f"Indexed ({n_chunks} new chunks in batch)")
+
+
+class IngestWorker:
+    """
+    Drains the job queue in batches. DuckDB lets one process at a time open a
+    file, so there is one worker per main DB (register_worker) and each batch
+    runs in a fresh child process: the main DB is released between batches so
+    the UI can read it, and a parser crash or OOM fails that batch's jobs
+    instead of the worker. Parsing inside a batch still fans out over
+    IngestEngine's process pool.
+    """
+    def __init__(self, db_path: str, jobs_db: str = None, batch_files: int = BATCH_FILES, ocr: bool = True,
+                 ocr_opts: dict = None, index_opts: dict = None, parse_workers: int = None):
+        self.db_path = db_path
+        self.queue = JobQueue(jobs_db or jobs_db_path(db_path))
+        self.batch_files = batch_files
+        self.ocr = ocr
+        self.ocr_opts = ocr_opts
+        self.index_opts = index_opts
+        self.parse_workers = parse_workers
+
+    def run(self, once: bool = False):
+        """Process queued jobs until interrupted (or until the queue is empty with `once`)."""
+        pid = os.getpid()
+        if not self.queue.register_worker(pid):
+            print("Another ingest worker is already running for this DB")
+            return
+        n = self.queue.recover()
+        if n:
+            print(f"Requeued {n} jobs left running by a previous worker")
+        stop = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(pid, stop), daemon=True)
+        beat.start()
+        try:
+            while True:
+                jobs = self.queue.claim(self.batch_files)
+                if not jobs:
+                    if once:
+                        return
+                    time.sleep(POLL_S)
+                    continue
+                self._process(jobs)
+        finally:
+            stop.set()
+            self.queue.unregister_worker(pid)
+
+    def _process(self, jobs):
+        t0 = time.perf_counter()
+        print(f"⏳ Ingesting {len(jobs)} files")
+        proc = mp.get_context("spawn").Process(
+            target=_run_batch,
+            args=(self.db_path, self.queue.path, jobs, self.ocr, self.ocr_opts, self.index_opts, self.parse_workers)
+        )
+        proc.start()
+        proc.join()
+        if proc.exitcode:
+            # Jobs already indexed or failed keep their state
+            self.queue.advance([j["job_id"] for j in jobs], "failed", f"Ingest batch exited with code {proc.exitcode}")
+            print(f"❌ Batch failed (exit code {proc.exitcode})")
+        else:
+            print(f"✅ Batch of {len(jobs)} files done in {time.perf_counter() - t0:.1f}s")
+
+    def _heartbeat(self, pid, stop):
+        while not stop.wait(HEARTBEAT_S):
+            try:
+                self.queue.heartbeat(pid)
+            except Exception as e:
+                print(f"Heartbeat failed: {e}")
+
+
+def start_worker(db_path: str, jobs_db: str = None, embed_backend: str = None, local_index_dir: str = None):
+    """Launch a detached `python -m jobs.worker` unless one is alive; returns the Popen or None."""
+    jobs_db = jobs_db or jobs_db_path(db_path)
+    if JobQueue(jobs_db).worker_alive():
+        return None
+    cmd = [sys.executable, "-m", "jobs.worker", db_path, "--jobs-db", jobs_db]
+    if embed_backend:
+        cmd += ["--embed-backend", embed_backend]
+    if local_index_dir:
+        cmd += ["--local-index-dir", local_index_dir]
+    # Detached so a browser refresh or Streamlit rerun doesn't take the worker down
+    detach = ({"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP} if os.name == "nt"
+              else {"start_new_session": True})
+    return subprocess.Popen(cmd, cwd=Path(__file__).resolve().parent.parent, **detach)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Drain the ingest job queue")
+    ap.add_argument("db_path")
+    ap.add_argument("--jobs-db", default=None, help="queue file (default: <db>.jobs.duckdb)")
+    ap.add_argument("--embed-backend", default="gemini")
+    ap.add_argument("--local-index-dir", default=None)
+    ap.add_argument("--batch-files", type=int, default=BATCH_FILES)
+    ap.add_argument("--parse-workers", type=int, default=None)
+    ap.add_argument("--no-ocr", action="store_true")
+    ap.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = ap.parse_args()
+    index_opts = {"embed_backend": args.embed_backend, "local_index_dir": args.local_index_dir}
+    IngestWorker(args.db_path, args.jobs_db, batch_files=args.batch_files, ocr=not args.no_ocr,
+                 index_opts=index_opts, parse_workers=args.parse_workers).run(once=args.once)
+
+if __name__ == "__main__":
+    main()
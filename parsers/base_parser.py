@@ -1,12 +1,17 @@
 import duckdb
 import hashlib
-import time
+import pandas as pd
 from datetime import datetime
 from pathlib import Path
+from rag.metrics import EventLog
+
+PAGE_WRITE_BATCH = 1000  # pages per DataFrame append
 
 class BaseParser:
-    def __init__(self, db_path: str):
-        self.conn = duckdb.connect(db_path, read_only=False)
+    def __init__(self, db_path: str = None):
+        # No db_path: extraction-only instance (e.g. in an ingest worker process)
+        self.conn = duckdb.connect(db_path, read_only=False) if db_path else None
+        self.events = EventLog(self.conn) if self.conn else None
         self.now = lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     # -----------------------------
@@ -15,19 +20,15 @@ class BaseParser:
     def hash_content(self, data: str) -> str:
         return hashlib.sha256(data.encode()).hexdigest()
 
-    def log_event(self, file_id: str, stage: str, ok: bool, message: str = ""):
-        """Insert log event safely."""
-        self.conn.execute(
-            "INSERT INTO ingest_events VALUES (?, ?, ?, ?, ?, ?)",
-            (
-                hashlib.md5(f"{file_id}{time.time()}".encode()).hexdigest(),
-                file_id,
-                stage,
-                ok,
-                message,
-                self.now()
-            )
-        )
+    def log_event(self, file_id: str, stage: str, ok: bool, message: str = "", **timing):
+        """Queue a log event (buffered, see rag.metrics.EventLog); `timing` takes started_at/ended_at/n_items/n_bytes."""
+        self.events.log(file_id, stage, ok, message, **timing)
+        if stage == "parse":
+            self.events.flush()  # end of a file: make it visible to other readers now
+
+    def extract(self, file_path: str):
+        """Yield (page_no, text, ocr_needed, ocr_done) for each page. No DB access."""
+        raise NotImplementedError
 
     # -----------------------------
     # File-level operations
@@ -57,7 +58,8 @@ class BaseParser:
             raise ValueError(f"Cannot insert page: file_id {file_id} does not exist in files table")
 
         self.conn.execute("""
-            INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO pages (page_id, file_id, page_no, text, n_tokens, ocr_needed, ocr_done, embedding)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             self.hash_content(f"{file_id}_{page_no}"),
             file_id,
@@ -71,34 +73,89 @@ class BaseParser:
 
         self.log_event(file_id, f"page_{page_no}_parsed", True, "Inserted page record")
 
+    def insert_pages(self, file_id, pages, stage="pages_parsed"):
+        """
+        Bulk insert pages for one file inside a single transaction.
+        pages: iterable of (page_no, text[, ocr_needed, ocr_done]); may be a generator,
+        it is written in PAGE_WRITE_BATCH sized DataFrame appends.
+        Logs one event for the whole file instead of one per page.
+        """
+        started = datetime.now()
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            n = self._write_pages(file_id, pages)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.log_event(file_id, stage, True, f"Inserted {n} page records", started_at=started, n_items=n)
+        return n
+
+    def _write_pages(self, file_id, pages):
+        res = self.conn.execute("SELECT 1 FROM files WHERE file_id = ?", (file_id,)).fetchone()
+        if not res:
+            raise ValueError(f"Cannot insert pages: file_id {file_id} does not exist in files table")
+
+        n, rows = 0, []
+        for page in pages:
+            if len(page) == 2:
+                page_no, text = page
+                ocr_needed = False
+                ocr_done = False
+            else:
+                page_no, text, ocr_needed, ocr_done = page
+            rows.append((
+                self.hash_content(f"{file_id}_{page_no}"),
+                file_id,
+                page_no,
+                text,
+                len(text.split()),
+                ocr_needed,
+                ocr_done,
+            ))
+            if len(rows) >= PAGE_WRITE_BATCH:
+                n += self._append_pages(rows)
+                rows = []
+        if rows:
+            n += self._append_pages(rows)
+        return n
+
+    def _append_pages(self, rows):
+        page_batch = pd.DataFrame(rows, columns=["page_id", "file_id", "page_no", "text", "n_tokens", "ocr_needed", "ocr_done"])
+        self.conn.register("page_batch", page_batch)
+        try:
+            self.conn.execute("""
+                INSERT INTO pages (page_id, file_id, page_no, text, n_tokens, ocr_needed, ocr_done)
+                SELECT page_id, file_id, page_no, text, n_tokens, ocr_needed, ocr_done FROM page_batch
+            """)
+        finally:
+            self.conn.unregister("page_batch")
+        return len(rows)
+
     # -----------------------------
     # Batch processing
     # -----------------------------
     def process_files(self, file_list):
         """
-        Process multiple files safely.
+        Process multiple files safely, one transaction per file.
         file_list: List of tuples (file_id, file_path, pages)
         pages: List of tuples (page_no, text[, ocr_needed, ocr_done])
         """
         for file_id, file_path, pages in file_list:
-            # 1️⃣ Ensure the file exists
             self.ensure_file_record(file_id, file_path)
+            self.insert_pages(file_id, pages)
 
-            # 2️⃣ Insert pages safely
-            for page in pages:
-                if len(page) == 2:
-                    page_no, text = page
-                    ocr_needed = False
-                    ocr_done = False
-                else:
-                    page_no, text, ocr_needed, ocr_done = page
-
-                self.insert_page(file_id, page_no, text, ocr_needed, ocr_done)
-
-    
     def process_files_transaction(self, file_list):
         """
         Batch processing inside a transaction. Good for bulk/million file ingestion.
         """
-        with self.conn.transaction():
-            self.process_files(file_list)
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            for file_id, file_path, pages in file_list:
+                self.ensure_file_record(file_id, file_path)
+                n = self._write_pages(file_id, pages)
+                self.log_event(file_id, "pages_parsed", True, f"Inserted {n} page records")
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
@@ -1,27 +1,80 @@
 # rag/parsers/csv_excel_parser.py
-import pandas as pd
+import csv
 import os
+from datetime import datetime
 from io import StringIO
+from itertools import islice
+import pandas as pd
 from .base_parser import BaseParser
 
-MAX_ROWS = 1000  # to avoid memory issues in demo
+ROWS_PER_PAGE = 200  # rows per `pages` record; the header is repeated on every page
 
 class CSVExcelParser(BaseParser):
+    def __init__(self, db_path: str = None, rows_per_page: int = ROWS_PER_PAGE):
+        super().__init__(db_path)
+        self.rows_per_page = rows_per_page
+
     def parse(self, file_id: str, file_path: str):
+        started = datetime.now()
         try:
-            ext = os.path.splitext(file_path)[1].lower()
-            if ext in [".csv"]:
-                df = pd.read_csv(file_path, nrows=MAX_ROWS)
-                text = df.to_csv(index=False)
-            else:
-                dfs = pd.read_excel(file_path, sheet_name=None)
-                texts = []
-                for sheet, df in dfs.items():
-                    snippet = df.head(MAX_ROWS).to_csv(index=False)
-                    texts.append(f"# Sheet: {sheet}\n{snippet}")
-                text = "\n\n".join(texts)
-            self.insert_page(file_id, 1, text, ocr_needed=False, ocr_done=True)
-            self.log_event(file_id, "parse", True, f"CSV/Excel parsed")
+            self.ensure_file_record(file_id, file_path)
+            n = self.insert_pages(file_id, self.extract(file_path))
+            self.log_event(file_id, "parse", True, f"CSV/Excel parsed",
+                           started_at=started, n_items=n, n_bytes=os.path.getsize(file_path))
         except Exception as e:
-            self.log_event(file_id, "parse", False, f"CSV/Excel parse error: {e}")
+            self.log_event(file_id, "parse", False, f"CSV/Excel parse error: {e}", started_at=started)
             raise
+
+    def extract(self, file_path: str):
+        """
+        Streams the whole file as row windows: one page per `rows_per_page` rows,
+        each starting with the header row. Only one window is held in memory.
+        """
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext in [".csv"]:
+            windows = self._csv_windows(file_path)
+        elif ext in [".xls"]:
+            windows = self._xls_windows(file_path)
+        else:
+            windows = self._xlsx_windows(file_path)
+        for page_no, text in enumerate(windows, start=1):
+            yield page_no, text, False, True
+
+    def _csv_windows(self, file_path: str):
+        # dtype=str keeps cells as written and avoids per-chunk type inference
+        reader = pd.read_csv(file_path, chunksize=self.rows_per_page, dtype=str, keep_default_na=False)
+        with reader:
+            for df in reader:
+                yield df.to_csv(index=False)
+
+    def _xlsx_windows(self, file_path: str):
+        from openpyxl import load_workbook
+        # read_only streams rows from the sheet XML instead of building the workbook in memory
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for ws in wb.worksheets:
+                rows = (r for r in ws.iter_rows(values_only=True) if any(v is not None for v in r))
+                header = next(rows, None)
+                if header is None:
+                    continue
+                while True:
+                    window = list(islice(rows, self.rows_per_page))
+                    if not window:
+                        break
+                    yield f"# Sheet: {ws.title}\n" + _to_csv([header] + window)
+        finally:
+            wb.close()
+
+    def _xls_windows(self, file_path: str):
+        # Legacy .xls has no streaming reader; load one sheet at a time
+        sheets = pd.ExcelFile(file_path)
+        for sheet in sheets.sheet_names:
+            df = sheets.parse(sheet, dtype=str, keep_default_na=False)
+            for start in range(0, len(df), self.rows_per_page):
+                snippet = df.iloc[start:start + self.rows_per_page].to_csv(index=False)
+                yield f"# Sheet: {sheet}\n{snippet}"
+
+def _to_csv(rows) -> str:
+    buf = StringIO()
+    csv.writer(buf, lineterminator="\n").writerows(["" if v is None else v for v in r] for r in rows)
+    return buf.getvalue()
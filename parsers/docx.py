@@ -1,15 +1,115 @@
 # rag/parsers/docx_parser.py
-import docx
+import csv
 import os
+import re
+import zipfile
+from datetime import datetime
+from io import StringIO
+from xml.etree.ElementTree import iterparse
 from .base_parser import BaseParser
 
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+SECTION_CHARS = 16000  # a section page is also closed once it grows past this
+_HEADING_STYLE = re.compile(r"^(?:heading\s*(\d)|title)$", re.I)
+
 class DocxParser(BaseParser):
+    def __init__(self, db_path: str = None, section_chars: int = SECTION_CHARS):
+        super().__init__(db_path)
+        self.section_chars = section_chars
+
     def parse(self, file_id: str, file_path: str):
+        started = datetime.now()
         try:
-            doc = docx.Document(file_path)
-            text = "\n".join([p.text for p in doc.paragraphs if p.text.strip()])
-            self.insert_page(file_id, 1, text, ocr_needed=False, ocr_done=True)
-            self.log_event(file_id, "parse", True, "DOCX parsed")
+            self.ensure_file_record(file_id, file_path)
+            n = self.insert_pages(file_id, self.extract(file_path))
+            self.log_event(file_id, "parse", True, "DOCX parsed",
+                           started_at=started, n_items=n, n_bytes=os.path.getsize(file_path))
         except Exception as e:
-            self.log_event(file_id, "parse", False, f"DOCX parse error: {e}")
+            self.log_event(file_id, "parse", False, f"DOCX parse error: {e}", started_at=started)
             raise
+
+    def extract(self, file_path: str):
+        """
+        Streams word/document.xml and yields one page per section: a new page
+        starts at each heading, or once the current one passes section_chars.
+        Headings come out as '#' lines and table rows as 'CSV:' lines.
+        """
+        page_no, blocks, size = 0, [], 0
+        for block, is_heading in self._blocks(file_path):
+            if blocks and (is_heading or size >= self.section_chars):
+                page_no += 1
+                yield page_no, "\n\n".join(blocks), False, True
+                blocks, size = [], 0
+            blocks.append(block)
+            size += len(block)
+        if blocks or page_no == 0:
+            yield page_no + 1, "\n\n".join(blocks), False, True
+
+    def _blocks(self, file_path: str):
+        with zipfile.ZipFile(file_path) as zf, zf.open("word/document.xml") as xml:
+            depth, body = 0, None
+            for event, elem in iterparse(xml, events=("start", "end")):
+                if event == "start":
+                    depth += 1
+                    if depth == 2 and elem.tag == W + "body":
+                        body = elem
+                    continue
+                depth -= 1
+                if depth != 2:
+                    continue
+                # A top-level body element is complete: render it, then drop it
+                yield from _render(elem)
+                if body is not None:
+                    body.clear()
+
+def _render(elem):
+    if elem.tag == W + "p":
+        text = _para_text(elem).strip()
+        if text:
+            level = _heading_level(elem)
+            yield (f"{'#' * level} {text}", True) if level else (text, False)
+    elif elem.tag == W + "tbl":
+        rows = _table_rows(elem)
+        if rows:
+            yield "\n".join(rows), False
+    elif elem.tag == W + "sdt":
+        # content controls wrap ordinary paragraphs/tables
+        content = elem.find(W + "sdtContent")
+        for child in (content if content is not None else []):
+            yield from _render(child)
+
+def _para_text(p) -> str:
+    out = []
+    for el in p.iter():
+        if el.tag == W + "t" and el.text:
+            out.append(el.text)
+        elif el.tag == W + "tab":
+            out.append("\t")
+        elif el.tag in (W + "br", W + "cr"):
+            out.append("\n")
+    return "".join(out)
+
+def _heading_level(p) -> int:
+    ppr = p.find(W + "pPr")
+    if ppr is None:
+        return 0
+    style = ppr.find(W + "pStyle")
+    if style is not None:
+        m = _HEADING_STYLE.match(style.get(W + "val", ""))
+        if m:
+            return min(6, int(m.group(1) or 1))
+    outline = ppr.find(W + "outlineLvl")
+    if outline is not None and outline.get(W + "val", "").isdigit():
+        return min(6, int(outline.get(W + "val")) + 1)
+    return 0
+
+def _table_rows(tbl):
+    rows = []
+    for tr in tbl.findall(W + "tr"):
+        cells = [" ".join(t for t in (_para_text(p).strip() for p in tc.iter(W + "p")) if t)
+                 for tc in tr.findall(W + "tc")]
+        if any(cells):
+            buf = StringIO()
+            csv.writer(buf, lineterminator="").writerow(cells)
+            rows.append("CSV: " + buf.getvalue())
+    return rows
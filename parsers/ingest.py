@@ -0,0 +1,139 @@
+import os
+import queue
+import multiprocessing as mp
+from datetime import datetime
+from typing import List, Tuple
+
+from .base_parser import BaseParser, PAGE_WRITE_BATCH
+from .registry import get_parser
+
+WORKER_BATCH_PAGES = 256  # pages per message from a worker to the writer
+
+def _extract_worker(tasks, results, batch_pages, parser_opts):
+    """Worker process: extract pages without touching DuckDB, stream them to the writer."""
+    while True:
+        item = tasks.get()
+        if item is None:
+            results.put(("exit", None, None))
+            return
+        file_id, file_path = item
+        n, batch = 0, []
+        started = datetime.now()
+        try:
+            parser = get_parser(file_path, None, **parser_opts)
+            for page in parser.extract(file_path):
+                batch.append(page)
+                n += 1
+                if len(batch) >= batch_pages:
+                    results.put(("pages", file_id, batch))
+                    batch = []
+            if batch:
+                results.put(("pages", file_id, batch))
+            results.put(("done", file_id, (n, None, started, datetime.now())))
+        except Exception as e:
+            results.put(("done", file_id, (n, f"{type(e).__name__}: {e}", started, datetime.now())))
+
+
+class IngestEngine:
+    """
+    Parallel multi-file ingestion: a process pool runs the parsers' extract()
+    and a single writer (this process, one DuckDB connection) commits pages in
+    batches, so workers never contend for DuckDB's write lock.
+    """
+    def __init__(self, db_path: str, workers: int = None, commit_pages: int = PAGE_WRITE_BATCH,
+                 batch_pages: int = WORKER_BATCH_PAGES, max_worker_mem_mb: int = None):
+        self.writer = BaseParser(db_path)
+        self.workers = workers or os.cpu_count() or 1
+        self.commit_pages = commit_pages
+        self.batch_pages = batch_pages
+        self.max_worker_mem_mb = max_worker_mem_mb
+
+    def ingest(self, files: List[Tuple[str, str]]):
+        """
+        files: list of (file_id, file_path).
+        Returns {file_id: (n_pages, error or None)}.
+        """
+        for file_id, file_path in files:
+            self.writer.ensure_file_record(file_id, file_path)
+
+        ctx = mp.get_context("spawn")
+        tasks = ctx.Queue()
+        results = ctx.Queue(maxsize=self.workers * 4)  # backpressure on fast extractors
+        n_workers = min(self.workers, len(files)) or 1
+        for f in files:
+            tasks.put(f)
+        for _ in range(n_workers):
+            tasks.put(None)
+        # Cores left over when there are fewer files than cores go to PDF page sharding
+        parser_opts = {
+            "shard_workers": max(1, (os.cpu_count() or 1) // n_workers),
+            "max_worker_mem_mb": self.max_worker_mem_mb,
+        }
+        procs = [ctx.Process(target=_extract_worker, args=(tasks, results, self.batch_pages, parser_opts))
+                 for _ in range(n_workers)]
+        for p in procs:
+            p.start()
+
+        outcome, timing, pending, n_pending = {}, {}, {}, 0
+        running = n_workers
+        try:
+            while running:
+                try:
+                    kind, file_id, payload = results.get(timeout=1.0)
+                except queue.Empty:
+                    if not any(p.is_alive() for p in procs):
+                        break
+                    continue
+                if kind == "exit":
+                    running -= 1
+                elif kind == "pages":
+                    pending.setdefault(file_id, []).extend(payload)
+                    n_pending += len(payload)
+                    if n_pending >= self.commit_pages:
+                        self._commit(pending)
+                        pending, n_pending = {}, 0
+                elif kind == "done":
+                    if payload[1] is None:
+                        # Flush before logging so a logged success is always durable
+                        self._commit(pending)
+                        pending, n_pending = {}, 0
+                    outcome[file_id] = payload[:2]
+                    timing[file_id] = payload[2:]
+            self._commit(pending)
+        finally:
+            for p in procs:
+                p.join(timeout=5)
+                if p.is_alive():
+                    p.terminate()
+
+        for file_id, file_path in files:
+            n, err = outcome.setdefault(file_id, (0, "worker exited before finishing"))
+            started, ended = timing.get(file_id, (None, None))
+            if err:
+                # Drop partial output so a retry starts clean
+                self.writer.conn.execute("DELETE FROM pages WHERE file_id = ?", (file_id,))
+                self.writer.log_event(file_id, "parse", False, f"Parse error: {err}",
+                                      started_at=started, ended_at=ended)
+            else:
+                self.writer.log_event(file_id, "parse", True, f"Parsed {n} pages", started_at=started,
+                                      ended_at=ended, n_items=n, n_bytes=os.path.getsize(file_path))
+        self.writer.events.flush()
+        return outcome
+
+    def _commit(self, pending):
+        if not pending:
+            return
+        conn = self.writer.conn
+        started = datetime.now()
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            n = sum(self.writer._write_pages(file_id, pages) for file_id, pages in pending.items())
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.writer.log_event(None, "page_write", True, f"Committed {n} pages", started_at=started, n_items=n)
+
+
+def ingest_files(db_path: str, files: List[Tuple[str, str]], workers: int = None):
+    return IngestEngine(db_path, workers=workers).ingest(files)
@@ -1,39 +1,90 @@
 import duckdb
 import tempfile
 import os
-import time
-from datetime import datetime
+import threading
+from concurrent.futures import Future
 from typing import List
 from google import genai
 from pdf2image import convert_from_path
 from PIL import Image
 import io
+from rag.metrics import EventLog
+from rag.retry import call_with_retry, bounded_map
+from .ocr_cache import OCRCache
+
+MAX_OCR_ATTEMPTS = 3  # failed OCR passes before a page stops being picked up
+
+def ensure_ocr_attempts_column(con):
+    con.execute("ALTER TABLE pages ADD COLUMN IF NOT EXISTS ocr_attempts INTEGER DEFAULT 0")
+
+def _is_rate_limited(e: Exception) -> bool:
+    return getattr(e, "code", None) == 429 or "RESOURCE_EXHAUSTED" in str(e)
+
+def _page_runs(page_numbers: List[int]):
+    """Group sorted page numbers into contiguous (first, last) runs."""
+    runs = []
+    for n in sorted(page_numbers):
+        if runs and n == runs[-1][1] + 1:
+            runs[-1][1] = n
+        else:
+            runs.append([n, n])
+    return runs
 
 class GeminiBatchOCR:
-    def __init__(self, db_path: str, model="models/gemini-2.0-flash", batch_size: int = 8):
+    """
+    OCR scheduler: keeps up to `max_in_flight` batches rendering/calling the model
+    concurrently, retries rate-limited calls with exponential backoff and commits
+    each batch as soon as it completes.
+    Rendered pages already in the OCR cache (exact image match, or perceptual
+    match within `near_match_bits`) never reach the model, and identical images
+    missing from it are sent once per run, however many pages and concurrent
+    batches show them.
+    Pending pages are taken fewest failed attempts first, and a page that failed
+    `max_attempts` times is no longer picked up, so it can't crowd out the rest.
+    `client` and `render` can be swapped for local fakes (see bench/bench_ocr.py).
+    """
+    def __init__(self, db_path: str, model="models/gemini-2.0-flash", batch_size: int = 8,
+                 max_in_flight: int = 4, max_retries: int = 5, backoff_s: float = 1.0,
+                 client=None, render=None, use_cache: bool = True, near_match_bits: int = None,
+                 max_attempts: int = MAX_OCR_ATTEMPTS):
         self.conn = duckdb.connect(db_path)
-        self.client = genai.Client()
+        ensure_ocr_attempts_column(self.conn)
+        self.client = client or genai.Client()
         self.model = model
         self.batch_size = batch_size
-        self.now = datetime.utcnow
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.max_attempts = max_attempts
+        self.render = render or self._extract_page_images
+        self.cache = OCRCache(self.conn, near_match_bits) if use_cache else None
+        self.events = EventLog(self.conn)
+        self._inflight = {}  # image_hash -> Future of (text, cacheable), for the current process() run
+        self._inflight_lock = threading.Lock()
 
     def _get_pending_pages(self, limit: int = 100):
-        """Fetch pages needing OCR from DuckDB."""
+        """Fetch pages needing OCR from DuckDB: fewest failed attempts first, then in page order."""
         query = """
         SELECT p.page_id, f.file_id, f.path, p.page_no
         FROM pages p
         JOIN files f ON p.file_id = f.file_id
         WHERE p.ocr_needed = TRUE AND (p.ocr_done = FALSE OR p.ocr_done IS NULL)
+          AND COALESCE(p.ocr_attempts, 0) < ?
+        ORDER BY COALESCE(p.ocr_attempts, 0), p.file_id, p.page_no
         LIMIT ?
         """
-        return self.conn.execute(query, [limit]).fetchall()
+        return self.conn.execute(query, [self.max_attempts, limit]).fetchall()
 
-    def _log_event(self, file_id, stage, ok, message=""):
-        event_id = str(hash(file_id + str(time.time())))
-        self.conn.execute(
-            "INSERT INTO ingest_events VALUES (?, ?, ?, ?, ?, ?)",
-            (event_id, file_id, stage, ok, message, self.now())
-        )
+    def pending_count(self) -> int:
+        """Pages process() would still pick up (needing OCR, not yet given up on)."""
+        return self.conn.execute("""
+            SELECT count(*) FROM pages
+            WHERE ocr_needed = TRUE AND (ocr_done = FALSE OR ocr_done IS NULL)
+              AND COALESCE(ocr_attempts, 0) < ?
+        """, [self.max_attempts]).fetchone()[0]
+
+    def _log_event(self, file_id, stage, ok, message="", **timing):
+        self.events.log(file_id, stage, ok, message, **timing)
 
     def _save_ocr_result(self, page_id, text):
         self.conn.execute(
@@ -41,9 +92,42 @@ class GeminiBatchOCR:
             (text, page_id)
         )
 
+    def _record_failures(self, page_ids):
+        if page_ids:
+            self.conn.execute(
+                "UPDATE pages SET ocr_attempts = COALESCE(ocr_attempts, 0) + 1 "
+                "WHERE page_id IN (SELECT UNNEST(?::VARCHAR[]))",
+                [list(page_ids)]
+            )
+
+    def _save_batch(self, page_ids, texts, keys=None, cached=None) -> int:
+        """Write one batch's texts (None = model returned nothing for that page) and cache entries."""
+        saved, missing = 0, []
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            texts = list(texts) + [None] * (len(page_ids) - len(texts))
+            for pid, txt in zip(page_ids, texts):
+                if txt is not None:
+                    self._save_ocr_result(pid, txt)
+                    saved += 1
+                else:
+                    missing.append(pid)
+            self._record_failures(missing)
+            if keys is not None:
+                self.cache.put_many([(k, t) for k, t in zip(keys, texts) if k is not None and t is not None])
+                self.cache.record_hits([k for k, c in zip(keys, cached) if k is not None and c is not None])
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return saved
+
     def _extract_page_images(self, pdf_path: str, page_numbers: List[int]) -> List[Image.Image]:
-        """Convert specific PDF pages to PIL Images."""
-        return convert_from_path(pdf_path, fmt="jpeg", first_page=min(page_numbers), last_page=max(page_numbers))
+        """Convert specific PDF pages to PIL Images, rendering only the requested pages."""
+        images = []
+        for first, last in _page_runs(page_numbers):
+            images.extend(convert_from_path(pdf_path, fmt="jpeg", first_page=first, last_page=last))
+        return images
 
     def _call_gemini_batch(self, images: List[Image.Image]) -> List[str]:
         """Send multiple images to Gemini-2.0-Flash OCR."""
@@ -73,30 +157,112 @@ class GeminiBatchOCR:
         text = response.text.strip()
         return text.split("\n\n---\n\n") if "---" in text else [text]
 
+    def _call_with_retry(self, images: List[Image.Image]) -> List[str]:
+        return call_with_retry(lambda: self._call_gemini_batch(images), _is_rate_limited,
+                               self.max_retries, self.backoff_s)
+
+    def _ocr_batch(self, path: str, page_nos: List[int]):
+        """
+        Runs in a worker thread (DuckDB only through its own cursor).
+        Returns (texts, cache keys, served texts), aligned with page_nos: served
+        is the text of pages that did not go to the model (cache hits, or an
+        identical image OCR'd by this or another batch), None otherwise. A key
+        is None where the text must not be cached.
+        """
+        images = self.render(path, page_nos)
+        if self.cache is None:
+            texts = self._call_with_retry(images)
+            return (texts + [None] * len(images))[:len(images)], None, None
+
+        keys = self.cache.keys(images)
+        cur = self.conn.cursor()
+        try:
+            cached = self.cache.lookup(keys, con=cur)
+        finally:
+            cur.close()
+
+        # One model call per distinct missing image; images another batch is
+        # already OCRing are awaited instead of sent again
+        first = {}
+        for i, t in enumerate(cached):
+            if t is None:
+                first.setdefault(keys[i][0], i)
+        own, shared = {}, {}
+        with self._inflight_lock:
+            for h in first:
+                fut = self._inflight.get(h)
+                if fut is None:
+                    own[h] = self._inflight[h] = Future()
+                else:
+                    shared[h] = fut
+        if own:
+            hashes = list(own)
+            try:
+                fresh = self._call_with_retry([images[first[h]] for h in hashes])
+            except Exception as e:
+                with self._inflight_lock:
+                    for h in hashes:
+                        del self._inflight[h]  # let a later batch try again
+                for h in hashes:
+                    own[h].set_exception(e)
+                raise
+            # A reply the separator heuristic can't split into one text per image
+            # is still saved page-wise, but never cached under an image hash
+            cacheable = len(fresh) == len(hashes)
+            for n, h in enumerate(hashes):
+                own[h].set_result((fresh[n] if n < len(fresh) else None, cacheable))
+
+        texts, out_keys, served = list(cached), list(keys), list(cached)
+        for i, t in enumerate(cached):
+            if t is None:
+                h = keys[i][0]
+                texts[i], cacheable = (own.get(h) or shared[h]).result()
+                if not cacheable:
+                    out_keys[i] = None
+                if h in shared or i != first[h]:
+                    served[i] = texts[i]
+        return texts, out_keys, served
+
     def process(self, batch_limit: int = 100):
+        self._inflight = {}
         pending = self._get_pending_pages(batch_limit)
         if not pending:
             print("✅ No OCR pending.")
-            return
+            return 0
 
         grouped_by_file = {}
         for row in pending:
             page_id, file_id, path, page_no = row
             grouped_by_file.setdefault((file_id, path), []).append((page_id, page_no))
 
+        jobs = []
         for (file_id, path), pages in grouped_by_file.items():
             pages.sort(key=lambda x: x[1])
-            page_batches = [pages[i:i+self.batch_size] for i in range(0, len(pages), self.batch_size)]
-
-            for batch in page_batches:
-                page_ids, page_nos = zip(*batch)
-                try:
-                    images = self._extract_page_images(path, list(page_nos))
-                    texts = self._call_gemini_batch(images)
-                    for pid, txt in zip(page_ids, texts):
-                        self._save_ocr_result(pid, txt)
-                    self._log_event(file_id, "ocr", True, f"OCR completed for pages {page_nos}")
-                    print(f"OCR ✅ {file_id}: pages {page_nos}")
-                except Exception as e:
-                    self._log_event(file_id, "ocr", False, str(e))
-                    print(f"OCR ❌ {file_id} pages {page_nos}: {e}")
+            for i in range(0, len(pages), self.batch_size):
+                page_ids, page_nos = zip(*pages[i:i+self.batch_size])
+                jobs.append((file_id, path, page_ids, page_nos))
+
+        done_pages = 0
+        cache_stats = {}  # file_id -> [hits, pages]
+        batches = bounded_map(lambda job: self._ocr_batch(job[1], list(job[3])), jobs, self.max_in_flight)
+        for (file_id, path, page_ids, page_nos), fut, started in batches:
+            try:
+                # Commit each batch as it lands so progress survives a crash
+                texts, keys, cached = fut.result()
+                done_pages += self._save_batch(page_ids, texts, keys, cached)
+                if cached is not None:
+                    stats = cache_stats.setdefault(file_id, [0, 0])
+                    stats[0] += sum(c is not None for c in cached)
+                    stats[1] += len(cached)
+                self._log_event(file_id, "ocr", True, f"OCR completed for pages {page_nos}", started_at=started,
+                                n_items=len(page_ids), n_bytes=sum(len(t.encode()) for t in texts if t))
+                print(f"OCR ✅ {file_id}: pages {page_nos}")
+            except Exception as e:
+                self._record_failures(page_ids)
+                self._log_event(file_id, "ocr", False, str(e), started_at=started)
+                print(f"OCR ❌ {file_id} pages {page_nos}: {e}")
+
+        for file_id, (hits, total) in cache_stats.items():
+            self._log_event(file_id, "ocr_cache", True, f"{hits}/{total} pages served from OCR cache ({hits / total:.0%} hit rate)")
+        self.events.flush()
+        return done_pages
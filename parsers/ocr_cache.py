@@ -0,0 +1,84 @@
+import hashlib
+from typing import List, Optional, Tuple
+from PIL import Image
+
+def image_hash(img: Image.Image) -> str:
+    """Exact key: hash of the rendered pixels (plus mode/size)."""
+    h = hashlib.sha256(f"{img.mode}:{img.size}:".encode())
+    h.update(img.tobytes())
+    return h.hexdigest()
+
+def dhash(img: Image.Image) -> int:
+    """64-bit difference hash; small Hamming distance = visually near-identical page."""
+    small = img.convert("L").resize((9, 8), Image.LANCZOS)
+    px = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return bits
+
+def ensure_ocr_cache_table(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS ocr_cache (
+            image_hash VARCHAR PRIMARY KEY,
+            phash UBIGINT,
+            text TEXT,
+            hits INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT now()
+        )
+    """)
+
+class OCRCache:
+    """
+    OCR results keyed by rendered page image, stored in DuckDB next to `pages`.
+    With `near_match_bits` set, a page whose perceptual hash is within that many
+    bits of a cached page also counts as a hit (cover sheets, rescans of the same form).
+    """
+    def __init__(self, con, near_match_bits: Optional[int] = None):
+        self.conn = con
+        self.near_match_bits = near_match_bits
+        ensure_ocr_cache_table(self.conn)
+
+    def keys(self, images: List[Image.Image]) -> List[Tuple[str, int]]:
+        return [(image_hash(img), dhash(img)) for img in images]
+
+    def lookup(self, keys: List[Tuple[str, int]], con=None) -> List[Optional[str]]:
+        """
+        Cached text per key (None on miss). Pass a cursor as `con` when calling
+        from a worker thread.
+        """
+        con = con or self.conn
+        rows = con.execute(
+            "SELECT image_hash, text FROM ocr_cache WHERE image_hash IN (SELECT UNNEST(?::VARCHAR[]))",
+            [[k for k, _ in keys]]
+        ).fetchall()
+        found = dict(rows)
+        out = []
+        for key, phash in keys:
+            text = found.get(key)
+            if text is None and self.near_match_bits is not None:
+                row = con.execute("""
+                    SELECT text FROM ocr_cache
+                    WHERE bit_count(xor(phash, ?::UBIGINT)) <= ?
+                    ORDER BY bit_count(xor(phash, ?::UBIGINT))
+                    LIMIT 1
+                """, [phash, self.near_match_bits, phash]).fetchone()
+                text = row[0] if row else None
+            out.append(text)
+        return out
+
+    def put_many(self, items: List[Tuple[Tuple[str, int], str]]):
+        rows = [(key, phash, text) for (key, phash), text in items]
+        if rows:
+            self.conn.executemany("""
+                INSERT INTO ocr_cache (image_hash, phash, text) VALUES (?, ?::UBIGINT, ?)
+                ON CONFLICT DO NOTHING
+            """, rows)
+
+    def record_hits(self, keys: List[Tuple[str, int]]):
+        if keys:
+            self.conn.execute(
+                "UPDATE ocr_cache SET hits = hits + 1 WHERE image_hash IN (SELECT UNNEST(?::VARCHAR[]))",
+                [[k for k, _ in keys]]
+            )
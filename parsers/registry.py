@@ -4,7 +4,7 @@ from .docx import DocxParser
 from .text import TxtParser
 from .csv import CSVExcelParser
 
-def get_parser(file_path: str, db_path: str):
+def get_parser(file_path: str, db_path: str, shard_workers: int = 1, max_worker_mem_mb: int = None):
     mime, _ = mimetypes.guess_type(file_path)
     if not mime:
         ext = file_path.lower().split('.')[-1]
@@ -12,10 +12,10 @@ def get_parser(file_path: str, db_path: str):
         ext = mime.split('/')[-1]
 
     if ext in ["pdf"]:
-        return PDFParser(db_path)
-    elif ext in ["docx", "doc"]:
+        return PDFParser(db_path, shard_workers=shard_workers, max_worker_mem_mb=max_worker_mem_mb)
+    elif ext in ["docx", "doc", "vnd.openxmlformats-officedocument.wordprocessingml.document"]:
         return DocxParser(db_path)
-    elif ext in ["csv", "xls", "xlsx"]:
+    elif ext in ["csv", "xls", "xlsx", "vnd.ms-excel", "vnd.openxmlformats-officedocument.spreadsheetml.sheet"]:
         return CSVExcelParser(db_path)
     elif ext in ["plain", "txt"]:
         return TxtParser(db_path)
@@ -1,13 +1,58 @@
 # rag/parsers/txt_parser.py
+import codecs
+import mmap
+import os
+from datetime import datetime
 from .base_parser import BaseParser
 
+PAGE_BYTES = 64 * 1024  # target page size; pages end on a paragraph/line break when one is near
+
 class TxtParser(BaseParser):
+    def __init__(self, db_path: str = None, page_bytes: int = PAGE_BYTES):
+        super().__init__(db_path)
+        self.page_bytes = page_bytes
+
     def parse(self, file_id: str, file_path: str):
+        started = datetime.now()
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                text = f.read()
-            self.insert_page(file_id, 1, text, ocr_needed=False, ocr_done=True)
-            self.log_event(file_id, "parse", True, "TXT parsed")
+            self.ensure_file_record(file_id, file_path)
+            n = self.insert_pages(file_id, self.extract(file_path))
+            self.log_event(file_id, "parse", True, "TXT parsed",
+                           started_at=started, n_items=n, n_bytes=os.path.getsize(file_path))
         except Exception as e:
-            self.log_event(file_id, "parse", False, f"TXT parse error: {e}")
+            self.log_event(file_id, "parse", False, f"TXT parse error: {e}", started_at=started)
             raise
+
+    def extract(self, file_path: str):
+        """
+        Memory-maps the file and yields ~page_bytes windows cut at paragraph
+        breaks (else line breaks, else hard). Decoding is incremental, so a
+        multi-byte character split by a hard cut is carried into the next page.
+        """
+        with open(file_path, 'rb') as f:
+            f.seek(0, 2)
+            if f.tell() == 0:
+                yield 1, "", False, True
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="ignore")
+                size, pos, page_no = len(mm), 0, 0
+                while pos < size:
+                    end = self._cut(mm, pos, size)
+                    text = decoder.decode(mm[pos:end], final=end >= size)
+                    pos = end
+                    if text:
+                        page_no += 1
+                        yield page_no, text, False, True
+
+    def _cut(self, mm, pos: int, size: int) -> int:
+        end = pos + self.page_bytes
+        if end >= size:
+            return size
+        # Only look back half a window so pages stay close to page_bytes
+        lo = pos + self.page_bytes // 2
+        para = max(mm.rfind(b"\n\n", lo, end), mm.rfind(b"\n\r\n", lo, end))
+        if para != -1:
+            return mm.find(b"\n", para + 1) + 1
+        line = mm.rfind(b"\n", lo, end)
+        return line + 1 if line != -1 else end
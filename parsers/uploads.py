@@ -0,0 +1,68 @@
+# Content-addressed uploads: identical bytes map to the file already ingested.
+# Usage (hash files registered before content hashing existed): python -m parsers.uploads <db_path>
+import argparse
+import hashlib
+import os
+from pathlib import Path
+
+import duckdb
+
+HASH_CHUNK_BYTES = 1024 * 1024  # read/hash/write granularity; files are never held whole
+
+def ensure_file_hash_column(con):
+    con.execute("ALTER TABLE files ADD COLUMN IF NOT EXISTS content_hash VARCHAR")
+
+def upload_sha256(src) -> str:
+    """sha256 of a file-like object (e.g. an in-memory upload), read in HASH_CHUNK_BYTES blocks."""
+    h = hashlib.sha256()
+    src.seek(0)
+    for block in iter(lambda: src.read(HASH_CHUNK_BYTES), b""):
+        h.update(block)
+    return h.hexdigest()
+
+def file_sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return upload_sha256(f)
+
+def save_upload(src, dest_path):
+    """Copy a file-like upload to dest_path in HASH_CHUNK_BYTES blocks."""
+    src.seek(0)
+    with open(dest_path, "wb") as out:
+        for block in iter(lambda: src.read(HASH_CHUNK_BYTES), b""):
+            out.write(block)
+
+def find_file_by_hash(con, content_hash: str):
+    """(file_id, file_name) of an ingested file with these bytes, or None. Files whose parse failed (no pages) don't count."""
+    return con.execute("""
+        SELECT f.file_id, f.file_name FROM files f
+        WHERE f.content_hash = ? AND EXISTS (SELECT 1 FROM pages p WHERE p.file_id = f.file_id)
+        ORDER BY f.uploaded_at
+        LIMIT 1
+    """, [content_hash]).fetchone()
+
+def register_file(con, file_id: str, file_path: str, content_hash: str):
+    con.execute(
+        "INSERT INTO files (file_id, file_name, path, content_hash) VALUES (?, ?, ?, ?)",
+        [file_id, Path(file_path).name, str(file_path), content_hash]
+    )
+
+def backfill_content_hashes(con) -> int:
+    """Hash files registered without a content hash (where the file is still on disk)."""
+    ensure_file_hash_column(con)
+    rows = con.execute("SELECT file_id, path FROM files WHERE content_hash IS NULL").fetchall()
+    n = 0
+    for file_id, path in rows:
+        if path and os.path.exists(path):
+            con.execute("UPDATE files SET content_hash = ? WHERE file_id = ?", [file_sha256(path), file_id])
+            n += 1
+    return n
+
+def main():
+    ap = argparse.ArgumentParser(description="Fill files.content_hash for files registered before upload dedup")
+    ap.add_argument("db_path")
+    args = ap.parse_args()
+    n = backfill_content_hashes(duckdb.connect(args.db_path))
+    print(f"✅ Hashed {n} files")
+
+if __name__ == "__main__":
+    main()
@@ -1,74 +1,126 @@
 import re, hashlib
-from typing import List, Dict, Iterable
+from typing import List, Dict, Iterable, Iterator, Tuple
 
 MAX_TOKENS = 600          
 MIN_TOKENS = 120
 OVERLAP_TOKENS = 60
 
+_TOKEN = re.compile(r"\w+|\S")
+# last OVERLAP_TOKENS words, matched on the reversed text
+_TAIL = re.compile(r"\s*(?:\S+\s+){0,%d}\S+" % max(0, OVERLAP_TOKENS - 1))
+_HEADING = re.compile(r"^\s*#{1,6}\s+\S")  # markdown-ish heading
+
 def _hash(s: str) -> str:
     return hashlib.sha256(s.encode()).hexdigest()
 
-def _split_blocks(text: str) -> List[str]:
-    # Respect table blocks and headings (from your OCR prompt conventions)
+def _len_tokens(s: str) -> int:
+    # cheap token proxy
+    return max(1, len(_TOKEN.findall(s)))
+
+def _split_blocks(text: str) -> List[Tuple[str, int, int]]:
+    """
+    Blocks as (text, char_start, char_end) in the page text. Respects table
+    blocks and headings (from the OCR prompt conventions); blank lines end a block.
+    """
     blocks, buf = [], []
-    lines = text.splitlines()
     def flush():
         if buf:
-            blocks.append("\n".join(buf).strip()); buf.clear()
-    for ln in lines:
-        if ln.strip().startswith("CSV:"):
-            flush(); blocks.append(ln.strip()); continue
-        if re.match(r"^\s*#{1,6}\s+\S", ln):  # markdown-ish heading
-            flush(); blocks.append(ln.strip()); continue
-        if ln.strip() == "":
-            flush(); continue
-        buf.append(ln)
+            first, s, _ = buf[0]
+            last, _, e = buf[-1]
+            joined = "\n".join(ln for ln, _, _ in buf).strip()
+            blocks.append((joined, s + len(first) - len(first.lstrip()), e - len(last) + len(last.rstrip())))
+            buf.clear()
+    pos, n = 0, len(text)
+    for ln in text.splitlines():
+        start, end = pos, pos + len(ln)
+        # Step over the line break splitlines() consumed
+        pos = end + (2 if text.startswith("\r\n", end) else 1 if end < n else 0)
+        stripped = ln.strip()
+        if stripped.startswith("CSV:") or _HEADING.match(ln):
+            flush()
+            lead = len(ln) - len(ln.lstrip())
+            blocks.append((stripped, start + lead, start + lead + len(stripped)))
+        elif stripped == "":
+            flush()
+        else:
+            buf.append((ln, start, end))
     flush()
-    return [b for b in blocks if b]
+    return blocks
 
-def _len_tokens(s: str) -> int:
-    # cheap token proxy
-    return max(1, len(re.findall(r"\w+|\S", s)))
+def count_tokens(s: str) -> int:
+    return len(_TOKEN.findall(s))
+
+def _tail_start(text: str, start: int, end: int) -> int:
+    """Offset where the last OVERLAP_TOKENS words of text[start:end] begin."""
+    m = _TAIL.match(text[start:end][::-1])
+    return end - m.end() if m else end
 
-def _merge_to_token_windows(blocks: List[str]) -> List[str]:
-    chunks, cur, cur_tokens = [], [], 0
-    for b in blocks:
-        bt = _len_tokens(b)
-        if cur_tokens + bt > MAX_TOKENS and cur:
-            chunks.append("\n".join(cur).strip())
-            # overlap
-            if OVERLAP_TOKENS > 0 and chunks[-1]:
-                tail = " ".join(chunks[-1].split()[-OVERLAP_TOKENS:])
-                cur, cur_tokens = [tail], _len_tokens(tail)
+def _token_windows(text: str) -> List[Tuple[str, int, int, int]]:
+    """
+    Blocks merged into ~MAX_TOKENS windows with OVERLAP_TOKENS words carried
+    over, as (chunk_text, n_tokens, char_start, char_end). Each block is
+    tokenised once; chunk token counts are sums of their parts (parts are joined
+    with whitespace, which never splits or merges tokens) and the overlap is
+    located by offset instead of re-splitting the finished chunk.
+    """
+    chunks = []  # [text, n_tokens, char_start, char_end]
+    cur, cur_tokens, cur_start, cur_end = [], 0, 0, 0
+    for b_text, b_start, b_end in _split_blocks(text):
+        bt = count_tokens(b_text)
+        if cur and cur_tokens + bt > MAX_TOKENS:
+            chunks.append(["\n".join(cur).strip(), cur_tokens, cur_start, cur_end])
+            if OVERLAP_TOKENS > 0:
+                cur_start = _tail_start(text, cur_start, cur_end)
+                tail = " ".join(text[cur_start:cur_end].split())
+                cur, cur_tokens = [tail], count_tokens(tail)
             else:
                 cur, cur_tokens = [], 0
-        cur.append(b); cur_tokens += bt
+        if not cur:
+            cur_start = b_start
+        cur.append(b_text)
+        cur_tokens += bt
+        cur_end = b_end
     if cur:
-        chunks.append("\n".join(cur).strip())
+        chunks.append(["\n".join(cur).strip(), cur_tokens, cur_start, cur_end])
     # pad small trailing chunks
-    if chunks and _len_tokens(chunks[-1]) < MIN_TOKENS and len(chunks) > 1:
-        chunks[-2] = (chunks[-2] + "\n" + chunks[-1]).strip()
-        chunks.pop()
+    if len(chunks) > 1 and chunks[-1][1] < MIN_TOKENS:
+        last = chunks.pop()
+        prev = chunks[-1]
+        prev[0] = (prev[0] + "\n" + last[0]).strip()
+        prev[1] += last[1]
+        prev[3] = last[3]
     return chunks
 
 def chunk_page(file_id: str, page_no: int, text: str) -> List[Dict]:
-    blocks = _split_blocks(text)
-    chunks = _merge_to_token_windows(blocks)
     out = []
-    for i, c in enumerate(chunks):
+    for i, (c, n_tokens, char_start, char_end) in enumerate(_token_windows(text)):
         out.append({
             "chunk_id": _hash(f"{file_id}:{page_no}:{i}:{_hash(c)[:12]}"),
             "file_id": file_id,
             "page_no": page_no,
             "ord": i,
             "text": c,
-            "n_tokens": _len_tokens(c),
+            "n_tokens": max(1, n_tokens),
+            # span of the page text this chunk covers (incl. overlap carried over)
+            "char_start": char_start,
+            "char_end": char_end,
         })
     return out
 
+def _chunk_page_row(p: Dict) -> List[Dict]:
+    return chunk_page(p["file_id"], p["page_no"], p["text"] or "")
+
+def chunk_pages(pages: Iterable[Dict], workers: int = 1, batch_size: int = 64) -> Iterator[Dict]:
+    """Chunk many pages, in page order; with workers > 1 pages are chunked in a process pool."""
+    if workers <= 1:
+        for p in pages:
+            yield from _chunk_page_row(p)
+        return
+    import multiprocessing as mp
+    with mp.get_context("spawn").Pool(workers) as pool:
+        for chunks in pool.imap(_chunk_page_row, pages, chunksize=batch_size):
+            yield from chunks
+
 def chunk_document(pages: Iterable[Dict]) -> List[Dict]:
     # pages: rows from DuckDB with file_id, page_no, text
-    all_chunks = []
-    for p in pages:
-        all_chunks.extend(chunk_page(p["file_id"], p["page_no"], p["text"] or ""))
-    return all_chunks
+    return list(chunk_pages(pages))
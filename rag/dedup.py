@@ -0,0 +1,245 @@
+import re
+import zlib
+import hashlib
+from typing import List, Dict, Tuple
+import numpy as np
+
+NUM_PERM = 128          # MinHash permutations (signature length)
+SHINGLE_WORDS = 3       # word n-grams hashed into the set
+DEDUP_THRESHOLD = 0.9   # estimated Jaccard similarity at which a chunk counts as a duplicate
+
+_PRIME = np.uint64((1 << 31) - 1)  # a * x + b stays below 2**64 for 32-bit shingle hashes
+_WORD = re.compile(r"\w+")
+
+def lsh_params(threshold: float, num_perm: int = NUM_PERM) -> Tuple[int, int]:
+    """(bands, rows) with bands * rows == num_perm whose S-curve midpoint (1/b)^(1/r) is nearest the threshold."""
+    options = [(num_perm // r, r) for r in range(1, num_perm + 1) if num_perm % r == 0]
+    return min(options, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+class MinHasher:
+    def __init__(self, num_perm: int = NUM_PERM, shingle_words: int = SHINGLE_WORDS, seed: int = 1):
+        rng = np.random.RandomState(seed)  # fixed seed: signatures must match across runs
+        self.a = rng.randint(1, int(_PRIME), size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, int(_PRIME), size=num_perm).astype(np.uint64)
+        self.shingle_words = shingle_words
+
+    def shingles(self, text: str) -> np.ndarray:
+        words = _WORD.findall(text.lower())
+        k = self.shingle_words
+        grams = {" ".join(words[i:i + k]) for i in range(max(1, len(words) - k + 1))}
+        return np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64, count=len(grams))
+
+    def signature(self, text: str) -> np.ndarray:
+        x = self.shingles(text)
+        return ((np.outer(x, self.a) + self.b) % _PRIME).min(axis=0).astype(np.uint32)
+
+
+class ChunkDeduper:
+    """
+    Near-duplicate filter between chunking and embedding, state kept in DuckDB:
+      chunk_signatures  canonical chunks (indexed) with their MinHash signature
+      chunk_lsh         LSH band buckets -> canonical chunk
+      chunk_aliases     duplicate chunk -> canonical chunk, with its own (file_id, page_no)
+    A chunk whose estimated Jaccard similarity to a canonical is >= threshold is
+    not embedded or indexed; its location is recorded against the canonical.
+    scope="file" only matches canonicals of the same file, so file-scoped
+    searches stay exact; scope="global" also folds duplicates across files
+    (file-scoped search then only finds them under the canonical's file).
+    The state is per database: a run with a different configuration starts it
+    over (the index version changes with it, so every page is re-evaluated).
+    """
+    def __init__(self, con, threshold: float = DEDUP_THRESHOLD, num_perm: int = NUM_PERM,
+                 shingle_words: int = SHINGLE_WORDS, scope: str = "file"):
+        if scope not in ("file", "global"):
+            raise ValueError(f"Unknown dedup scope: {scope}")
+        self.conn = con
+        self.threshold = threshold
+        self.scope = scope
+        self.hasher = MinHasher(num_perm, shingle_words)
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        self.seen = 0
+        self.duplicates = 0
+        self._pending, self._pending_aliases = [], []
+        ensure_dedup_tables(con)
+        self._reset_if_reconfigured()
+
+    @property
+    def config(self) -> str:
+        """Goes into the index version: changing it re-evaluates every page."""
+        return f"mh{len(self.hasher.a)}x{self.hasher.shingle_words}@{self.threshold}:{self.scope}"
+
+    def _reset_if_reconfigured(self):
+        row = self.conn.execute("SELECT config FROM dedup_meta").fetchone()
+        if row and row[0] == self.config:
+            return
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            for table in ("chunk_signatures", "chunk_lsh", "chunk_aliases", "dedup_meta"):
+                self.conn.execute(f"DELETE FROM {table}")
+            self.conn.execute("INSERT INTO dedup_meta (config) VALUES (?)", [self.config])
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def _buckets(self, sig: np.ndarray, file_id: str) -> List[str]:
+        prefix = f"{file_id}/" if self.scope == "file" else ""
+        return [f"{prefix}{i}:{hashlib.blake2b(sig[i * self.rows:(i + 1) * self.rows].tobytes(), digest_size=8).hexdigest()}"
+                for i in range(self.bands)]
+
+    def dedupe(self, chunks: List[Dict]) -> Tuple[List[Dict], List[Tuple]]:
+        """
+        Split chunks into (canonical chunks to embed/index, alias rows).
+        Nothing is written yet; call save() once the canonicals are indexed.
+        """
+        self._pending, self._pending_aliases = [], []
+        if not chunks:
+            return [], []
+        ids = [c["chunk_id"] for c in chunks]
+        known_canon = {r[0] for r in self.conn.execute(
+            "SELECT chunk_id FROM chunk_signatures WHERE chunk_id IN (SELECT UNNEST(?::VARCHAR[]))", [ids]).fetchall()}
+        known_alias = dict(self.conn.execute(
+            "SELECT chunk_id, canonical_id FROM chunk_aliases WHERE chunk_id IN (SELECT UNNEST(?::VARCHAR[]))", [ids]).fetchall())
+
+        sigs, buckets = {}, {}
+        for c in chunks:
+            if c["chunk_id"] not in known_canon and c["chunk_id"] not in known_alias:
+                sigs[c["chunk_id"]] = self.hasher.signature(c["text"])
+                buckets[c["chunk_id"]] = self._buckets(sigs[c["chunk_id"]], c["file_id"])
+
+        # Candidates already in the index, fetched for the whole batch at once
+        index = {}  # bucket -> [canonical ids]
+        cand_sigs = {}
+        if buckets:
+            rows = self.conn.execute(
+                "SELECT bucket, chunk_id FROM chunk_lsh WHERE bucket IN (SELECT UNNEST(?::VARCHAR[]))",
+                [[b for bs in buckets.values() for b in bs]]).fetchall()
+            for bucket, cid in rows:
+                index.setdefault(bucket, []).append(cid)
+            for cid, sig in self.conn.execute(
+                    "SELECT chunk_id, sig FROM chunk_signatures WHERE chunk_id IN (SELECT UNNEST(?::VARCHAR[]))",
+                    [list({cid for _, cid in rows})]).fetchall():
+                cand_sigs[cid] = np.frombuffer(sig, dtype=np.uint32)
+
+        canonical, aliases = [], []
+        for c in chunks:
+            cid = c["chunk_id"]
+            self.seen += 1
+            if cid in known_canon:
+                canonical.append(c)
+                continue
+            if cid in known_alias:
+                self.duplicates += 1
+                aliases.append((cid, known_alias[cid], c["file_id"], c["page_no"], None))
+                continue
+            best, best_sim = None, 0.0
+            for other in {o for b in buckets[cid] for o in index.get(b, ())}:
+                sim = float(np.mean(cand_sigs[other] == sigs[cid]))
+                if sim > best_sim:
+                    best, best_sim = other, sim
+            if best is not None and best_sim >= self.threshold:
+                self.duplicates += 1
+                aliases.append((cid, best, c["file_id"], c["page_no"], best_sim))
+            else:
+                # New canonical: later chunks in this batch can match it too
+                canonical.append(c)
+                cand_sigs[cid] = sigs[cid]
+                for b in buckets[cid]:
+                    index.setdefault(b, []).append(cid)
+                self._pending.append((cid, c["file_id"], c["page_no"], sigs[cid], buckets[cid]))
+        self._pending_aliases = [a for a in aliases if a[4] is not None]
+        return canonical, aliases
+
+    def save(self):
+        """Persist the canonicals and aliases found by the last dedupe()."""
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            if self._pending:
+                self.conn.executemany(
+                    "INSERT INTO chunk_signatures (chunk_id, file_id, page_no, sig) VALUES (?, ?, ?, ?) ON CONFLICT DO NOTHING",
+                    [(cid, fid, pno, sig.tobytes()) for cid, fid, pno, sig, _ in self._pending])
+                self.conn.executemany(
+                    "INSERT INTO chunk_lsh (bucket, chunk_id) VALUES (?, ?)",
+                    [(b, cid) for cid, _, _, _, bs in self._pending for b in bs])
+            if self._pending_aliases:
+                self.conn.executemany(
+                    "INSERT INTO chunk_aliases (chunk_id, canonical_id, file_id, page_no, similarity) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT DO NOTHING", self._pending_aliases)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        self._pending, self._pending_aliases = [], []
+
+    def forget(self, stale_ids: List[str], page_ids: List[str]) -> int:
+        """
+        Drop dedup state for chunks leaving the index. Pages whose chunks were
+        aliases of a removed canonical (other than `page_ids`, which are being
+        re-indexed anyway) are marked for re-indexing, so one of them becomes the
+        new canonical. Returns the number of pages requeued.
+        """
+        if not stale_ids:
+            return 0
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            orphans = [r[0] for r in self.conn.execute(
+                "SELECT chunk_id FROM chunk_aliases WHERE canonical_id IN (SELECT UNNEST(?::VARCHAR[]))",
+                [stale_ids]).fetchall()]
+            requeued = 0
+            if orphans:
+                requeued = self.conn.execute("""
+                    UPDATE pages SET indexed_version = NULL
+                    WHERE page_id IN (SELECT page_id FROM page_chunks WHERE chunk_id IN (SELECT UNNEST(?::VARCHAR[])))
+                      AND page_id NOT IN (SELECT UNNEST(?::VARCHAR[]))
+                """, [orphans, page_ids]).fetchone()[0]
+            for table, col in (("chunk_aliases", "canonical_id"), ("chunk_aliases", "chunk_id"),
+                               ("chunk_lsh", "chunk_id"), ("chunk_signatures", "chunk_id")):
+                self.conn.execute(f"DELETE FROM {table} WHERE {col} IN (SELECT UNNEST(?::VARCHAR[]))", [stale_ids])
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return requeued
+
+    def ratio(self) -> float:
+        return self.duplicates / self.seen if self.seen else 0.0
+
+
+def ensure_dedup_tables(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS chunk_signatures (
+            chunk_id VARCHAR PRIMARY KEY,
+            file_id VARCHAR,
+            page_no INTEGER,
+            sig BLOB
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS chunk_lsh (
+            bucket VARCHAR,
+            chunk_id VARCHAR
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS chunk_aliases (
+            chunk_id VARCHAR PRIMARY KEY,
+            canonical_id VARCHAR,
+            file_id VARCHAR,
+            page_no INTEGER,
+            similarity DOUBLE
+        )
+    """)
+    con.execute("CREATE TABLE IF NOT EXISTS dedup_meta (config VARCHAR)")
+
+def chunk_sources(con, chunk_ids: List[str]) -> Dict[str, List[Tuple[str, int]]]:
+    """Every (file_id, page_no) a canonical chunk stands for: its own location plus its duplicates'."""
+    rows = con.execute("""
+        SELECT chunk_id, file_id, page_no FROM chunk_signatures WHERE chunk_id IN (SELECT UNNEST(?::VARCHAR[]))
+        UNION ALL
+        SELECT canonical_id, file_id, page_no FROM chunk_aliases WHERE canonical_id IN (SELECT UNNEST(?::VARCHAR[]))
+        ORDER BY 1, 2, 3
+    """, [chunk_ids, chunk_ids]).fetchall()
+    out = {}
+    for cid, fid, pno in rows:
+        out.setdefault(cid, []).append((fid, pno))
+    return out
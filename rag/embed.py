@@ -1,10 +1,30 @@
+import re
+import zlib
+from pathlib import Path
 from typing import List, Dict
+import numpy as np
 from google import genai
 from google.genai import types
 
-class GeminiEmbedder:
-    def __init__(self, model: str = "text-embedding-004", output_dim: int = 768):
-        self.client = genai.Client()  # api key/env handled by SDK
+class Embedder:
+    """
+    Common interface for indexing and query embedding backends.
+    `model` and `output_dim` identify the vector space (used in cache keys and
+    the index version), so two backends must never share a `model` name.
+    """
+    model: str
+    output_dim: int
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.embed([query])[0]
+
+
+class GeminiEmbedder(Embedder):
+    def __init__(self, model: str = "text-embedding-004", output_dim: int = 768, client=None):
+        self.client = client or genai.Client()  # api key/env handled by SDK
         self.model = model
         self.output_dim = output_dim
 
@@ -17,3 +37,98 @@ class GeminiEmbedder:
         )
         # The response format is a list of embeddings in order
         return [vec.values for vec in resp.embeddings]
+
+
+_WORD = re.compile(r"\w+")
+
+class HashingEmbedder(Embedder):
+    """
+    CPU-only, no model files: signed feature hashing of word unigrams and
+    bigrams, log-scaled and L2-normalised. Deterministic across processes.
+    Lexical rather than semantic, but fast and fully offline.
+    """
+    def __init__(self, model: str = "hashing-v1", output_dim: int = 768):
+        self.model = model
+        self.output_dim = output_dim
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        rows, cols, signs = [], [], []
+        for r, text in enumerate(texts):
+            toks = _WORD.findall(text.lower())
+            feats = toks + [f"{a} {b}" for a, b in zip(toks, toks[1:])]
+            for f in feats:
+                h = zlib.crc32(f.encode())
+                rows.append(r)
+                cols.append(h % self.output_dim)
+                signs.append(1.0 if h & 0x80000000 else -1.0)
+
+        m = np.zeros((len(texts), self.output_dim), dtype=np.float32)
+        np.add.at(m, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)),
+                  np.asarray(signs, dtype=np.float32))
+        m = np.sign(m) * np.log1p(np.abs(m))
+        norms = np.linalg.norm(m, axis=1, keepdims=True)
+        m /= np.maximum(norms, 1e-12)
+        return m.tolist()
+
+
+class OnnxEmbedder(Embedder):
+    """
+    Local transformer encoder: `model_dir` holds model.onnx and tokenizer.json
+    (e.g. an exported sentence-transformers model). Mean pooling over the
+    attention mask; vectors longer than `output_dim` are truncated and
+    re-normalised (Matryoshka-style).
+    Needs the optional `onnxruntime` and `tokenizers` packages.
+    """
+    def __init__(self, model_dir: str, output_dim: int = 768, max_length: int = 512,
+                 batch_size: int = 32, threads: int = None):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("OnnxEmbedder needs `pip install onnxruntime tokenizers`") from e
+        model_dir = Path(model_dir)
+        opts = ort.SessionOptions()
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(model_dir / "model.onnx"), opts, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        self.model = f"onnx:{model_dir.name}"
+        self.output_dim = output_dim
+        self.batch_size = batch_size
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        out = []
+        for i in range(0, len(texts), self.batch_size):
+            enc = self.tokenizer.encode_batch(texts[i:i+self.batch_size])
+            ids = np.array([e.ids for e in enc], dtype=np.int64)
+            mask = np.array([e.attention_mask for e in enc], dtype=np.int64)
+            feed = {"input_ids": ids, "attention_mask": mask}
+            if "token_type_ids" in self.input_names:
+                feed["token_type_ids"] = np.zeros_like(ids)
+            hidden = self.session.run(None, feed)[0]
+            w = mask[..., None].astype(np.float32)
+            pooled = (hidden * w).sum(axis=1) / np.maximum(w.sum(axis=1), 1e-9)
+            pooled = pooled[:, :self.output_dim]
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            out.extend(pooled.tolist())
+        return out
+
+
+EMBED_BACKENDS = {
+    "gemini": GeminiEmbedder,
+    "hashing": HashingEmbedder,
+    "onnx": OnnxEmbedder,
+}
+
+def get_embedder(backend: str = "gemini", model: str = None, output_dim: int = 768, **opts) -> Embedder:
+    """Build an embedder by backend name; `model` falls back to the backend's default."""
+    try:
+        cls = EMBED_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    if model is not None and backend != "onnx":
+        opts["model"] = model
+    return cls(output_dim=output_dim, **opts)
@@ -0,0 +1,107 @@
+import hashlib
+from array import array
+from typing import List, Dict, Iterable, Tuple
+
+def ensure_embedding_cache_table(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+            model VARCHAR,
+            output_dim INTEGER,
+            text_hash VARCHAR,
+            vec BLOB,
+            last_used TIMESTAMP DEFAULT now(),
+            PRIMARY KEY (model, output_dim, text_hash)
+        )
+    """)
+
+class EmbeddingCache:
+    """
+    Content-addressed vector store in DuckDB, keyed by (model, output_dim, sha256(text)).
+    Vectors are kept as float32 blobs (4 bytes/dim).
+    """
+    def __init__(self, con, model: str, output_dim: int):
+        self.conn = con
+        self.model = model
+        self.output_dim = output_dim
+        ensure_embedding_cache_table(self.conn)
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    @staticmethod
+    def pack(vec) -> bytes:
+        return array("f", vec).tobytes()
+
+    @staticmethod
+    def unpack(blob: bytes) -> List[float]:
+        vec = array("f")
+        vec.frombytes(blob)
+        return vec.tolist()
+
+    def get_many(self, hashes: List[str]) -> Dict[str, List[float]]:
+        """One lookup for a whole batch; also refreshes last_used for eviction."""
+        if not hashes:
+            return {}
+        params = [self.model, self.output_dim, list(hashes)]
+        where = "model = ? AND output_dim = ? AND text_hash IN (SELECT UNNEST(?::VARCHAR[]))"
+        rows = self.conn.execute(f"SELECT text_hash, vec FROM embedding_cache WHERE {where}", params).fetchall()
+        if rows:
+            self.conn.execute(f"UPDATE embedding_cache SET last_used = now() WHERE {where}", params)
+        return {h: self.unpack(v) for h, v in rows}
+
+    def put_many(self, items: Iterable[Tuple[str, List[float]]]):
+        rows = [(self.model, self.output_dim, h, self.pack(v)) for h, v in items]
+        if rows:
+            self.conn.executemany("""
+                INSERT INTO embedding_cache (model, output_dim, text_hash, vec)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT DO NOTHING
+            """, rows)
+
+    def size_bytes(self) -> int:
+        return self.conn.execute("SELECT COALESCE(SUM(octet_length(vec)), 0) FROM embedding_cache").fetchone()[0]
+
+    def evict(self, max_bytes: int) -> int:
+        """Drop least recently used vectors (all models) until the cache fits in max_bytes."""
+        before = self.conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        self.conn.execute("""
+            DELETE FROM embedding_cache WHERE rowid IN (
+                SELECT rowid FROM (
+                    SELECT rowid, SUM(octet_length(vec)) OVER (
+                        ORDER BY last_used DESC ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+                    ) AS running
+                    FROM embedding_cache
+                ) WHERE running > ?
+            )
+        """, [max_bytes])
+        after = self.conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        return before - after
+
+
+class CachedEmbedder:
+    """Wraps an embedder; only texts missing from the cache reach the API."""
+    def __init__(self, embedder, cache: EmbeddingCache):
+        self.embedder = embedder
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        keys = [self.cache.key(t) for t in texts]
+        found = self.cache.get_many(list(set(keys)))
+
+        # Repeated texts inside one batch are embedded once
+        missing = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in missing:
+                missing[k] = t
+        if missing:
+            vecs = self.embedder.embed(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vecs))
+            self.cache.put_many(fresh.items())
+            found.update(fresh)
+
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        return [found[k] for k in keys]
@@ -0,0 +1,189 @@
+# Pipeline instrumentation: buffered ingest_events writer + per-stage summary.
+# Usage: python -m rag.metrics <db_path> [--hours 24]
+import argparse
+import atexit
+import threading
+import time
+import uuid
+import weakref
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import duckdb
+
+from schema import connect
+
+FLUSH_EVERY = 256        # buffered events before a flush
+FLUSH_INTERVAL_S = 2.0   # ...or seconds since the last flush
+MAX_BUFFERED = 10000     # events kept while the DB is locked by another process (db_path mode)
+
+_OPEN_LOGS = weakref.WeakSet()  # flushed by one exit hook; weak so logs (and their connections) can be freed
+
+EVENT_COLUMNS = ("event_id", "file_id", "stage", "ok", "message", "created_at",
+                 "started_at", "ended_at", "duration_ms", "n_items", "n_bytes")
+
+def ensure_event_columns(con):
+    """Create ingest_events, or add the timing columns to one created before they existed."""
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_events (
+            event_id VARCHAR PRIMARY KEY,
+            file_id VARCHAR,
+            stage VARCHAR,
+            ok BOOLEAN,
+            message TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            ended_at TIMESTAMP,
+            duration_ms DOUBLE,
+            n_items BIGINT,
+            n_bytes BIGINT
+        )
+    """)
+    con.execute("ALTER TABLE ingest_events ADD COLUMN IF NOT EXISTS started_at TIMESTAMP")
+    con.execute("ALTER TABLE ingest_events ADD COLUMN IF NOT EXISTS ended_at TIMESTAMP")
+    con.execute("ALTER TABLE ingest_events ADD COLUMN IF NOT EXISTS duration_ms DOUBLE")
+    con.execute("ALTER TABLE ingest_events ADD COLUMN IF NOT EXISTS n_items BIGINT")
+    con.execute("ALTER TABLE ingest_events ADD COLUMN IF NOT EXISTS n_bytes BIGINT")
+
+
+class Span:
+    """Handle yielded by EventLog.span(); set counts/message before the block ends."""
+    def __init__(self, n_items=None, n_bytes=None, message=""):
+        self.n_items = n_items
+        self.n_bytes = n_bytes
+        self.message = message
+
+
+class EventLog:
+    """
+    Buffered writer for ingest_events, shared by parsers, OCR, indexing and the
+    query path. Events are appended in one executemany per flush (every
+    FLUSH_EVERY events or FLUSH_INTERVAL_S seconds, on failures and at exit)
+    instead of one INSERT each. Thread-safe.
+
+    Pass `db_path` instead of `con` from processes that must not hold the DB
+    open (the UI while an ingest worker writes): each flush then connects
+    briefly, and while the file is locked events stay buffered for the next one.
+    """
+    def __init__(self, con=None, flush_every: int = FLUSH_EVERY, flush_interval_s: float = FLUSH_INTERVAL_S,
+                 db_path: str = None):
+        self.conn = con
+        self.db_path = db_path
+        self.flush_every = flush_every
+        self.flush_interval_s = flush_interval_s
+        self._buf = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        if con is not None:
+            ensure_event_columns(con)
+        _OPEN_LOGS.add(self)
+
+    def log(self, file_id, stage: str, ok: bool = True, message: str = "",
+            started_at: datetime = None, ended_at: datetime = None, n_items: int = None, n_bytes: int = None):
+        ended_at = ended_at or datetime.now()
+        duration_ms = (ended_at - started_at).total_seconds() * 1000 if started_at else None
+        row = (uuid.uuid4().hex, file_id, stage, ok, message, ended_at,
+               started_at, ended_at if started_at else None, duration_ms, n_items, n_bytes)
+        with self._lock:
+            self._buf.append(row)
+            due = (not ok or len(self._buf) >= self.flush_every
+                   or time.monotonic() - self._last_flush >= self.flush_interval_s)
+        if due:
+            self.flush()
+
+    @contextmanager
+    def span(self, stage: str, file_id=None, n_items: int = None, n_bytes: int = None, message: str = ""):
+        """Time a block as one event; an exception is logged as a failed event and re-raised."""
+        s = Span(n_items, n_bytes, message)
+        started = datetime.now()
+        try:
+            yield s
+        except Exception as e:
+            self.log(file_id, stage, False, s.message or str(e), started, None, s.n_items, s.n_bytes)
+            raise
+        self.log(file_id, stage, True, s.message, started, None, s.n_items, s.n_bytes)
+
+    def flush(self):
+        with self._lock:
+            rows, self._buf = self._buf, []
+            self._last_flush = time.monotonic()
+            if not rows:
+                return
+            if self.conn is not None:
+                self._insert(self.conn, rows)
+                return
+            try:
+                con = connect(self.db_path, timeout_s=0)
+            except duckdb.IOException:
+                self._buf = (rows + self._buf)[-MAX_BUFFERED:]
+                return
+            try:
+                ensure_event_columns(con)
+                self._insert(con, rows)
+            finally:
+                con.close()
+
+    @staticmethod
+    def _insert(con, rows):
+        con.executemany(
+            f"INSERT INTO ingest_events ({', '.join(EVENT_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(EVENT_COLUMNS))})",
+            rows
+        )
+
+    def close(self):
+        """Flush and stop tracking this log for the exit hook."""
+        self.flush()
+        _OPEN_LOGS.discard(self)
+
+    def __del__(self):
+        self._flush_at_exit()  # a log dropped without close() still writes what it buffered
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception:
+            pass  # connection already closed
+
+
+@atexit.register
+def _flush_open_logs():
+    for log in list(_OPEN_LOGS):
+        log._flush_at_exit()
+
+
+def stage_summary(con, since: datetime = None):
+    """Per-stage event counts, throughput and p50/p95/p99 latency (timed events only)."""
+    where = "WHERE duration_ms IS NOT NULL" + (" AND started_at >= ?" if since else "")
+    return con.execute(f"""
+        SELECT stage,
+               count(*) AS events,
+               count(*) FILTER (WHERE NOT ok) AS failed,
+               sum(n_items) AS items,
+               round(sum(n_bytes) / 1e6, 2) AS mb,
+               round(sum(duration_ms) / 1000, 2) AS busy_s,
+               round(sum(n_items) * 1000 / nullif(sum(duration_ms), 0), 1) AS items_per_s,
+               round(sum(n_bytes) / 1e3 / nullif(sum(duration_ms), 0), 2) AS mb_per_s,
+               round(quantile_cont(duration_ms, 0.5), 1) AS p50_ms,
+               round(quantile_cont(duration_ms, 0.95), 1) AS p95_ms,
+               round(quantile_cont(duration_ms, 0.99), 1) AS p99_ms
+        FROM ingest_events
+        {where}
+        GROUP BY stage
+        ORDER BY busy_s DESC
+    """, [since] if since else []).fetchdf()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Per-stage throughput and latency from ingest_events")
+    ap.add_argument("db_path")
+    ap.add_argument("--hours", type=float, default=None, help="only events from the last N hours")
+    args = ap.parse_args()
+    con = duckdb.connect(args.db_path)
+    ensure_event_columns(con)
+    since = datetime.now() - timedelta(hours=args.hours) if args.hours else None
+    df = stage_summary(con, since)
+    print(df.to_string(index=False) if len(df) else "No timed events yet.")
+
+if __name__ == "__main__":
+    main()
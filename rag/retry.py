@@ -0,0 +1,46 @@
+# Shared scheduling helpers for the API-bound stages (OCR calls, OpenSearch bulk requests).
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+
+MAX_BACKOFF_S = 60.0
+
+def backoff_sleep(attempt: int, backoff_s: float, max_backoff_s: float = MAX_BACKOFF_S):
+    """Jittered exponential backoff: 50-100% of min(max_backoff_s, backoff_s * 2**attempt)."""
+    delay = min(max_backoff_s, backoff_s * 2 ** attempt)
+    time.sleep(delay * (0.5 + random.random() / 2))
+
+def call_with_retry(fn, retryable, max_retries: int, backoff_s: float):
+    """fn(), retried with backoff while retryable(exception) holds, at most max_retries times."""
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if not retryable(e) or attempt == max_retries:
+                raise
+            backoff_sleep(attempt, backoff_s)
+
+def bounded_map(fn, items, max_in_flight: int):
+    """
+    Run fn(item) on a thread pool with at most `max_in_flight` calls outstanding,
+    pulling the next item from the (lazy) iterable as each call finishes, so only
+    that many items are materialised at once. Yields (item, future, started) in
+    completion order; call future.result() to get the value or the exception.
+    """
+    items = iter(items)
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        def submit_next():
+            item = next(items, None)
+            if item is not None:
+                in_flight[pool.submit(fn, item)] = (item, datetime.now())
+
+        for _ in range(max_in_flight):
+            submit_next()
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                item, started = in_flight.pop(fut)
+                submit_next()
+                yield item, fut, started
@@ -0,0 +1,108 @@
+import re
+import time
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+
+_MISS = object()
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+class TTLCache:
+    """Thread-safe LRU with a per-entry time-to-live (ttl=None: no expiry)."""
+    def __init__(self, maxsize: int = 1024, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=_MISS):
+        with self._lock:
+            item = self._data.get(key, _MISS)
+            if item is not _MISS and (self.ttl is None or time.monotonic() - item[0] < self.ttl):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not _MISS:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class QueryCache:
+    """
+    Layered cache for the ask path:
+      embeddings  normalised query text -> query vector
+      retrieval   (query vector, index version, filters) -> hits
+      answers     (normalised query, chunk ids, model) -> answer
+    Retrieval and answer layers are dropped whenever the index version moves
+    (run_indexing bumps it), so answers never outlive the chunks they cite.
+    """
+    def __init__(self, embed_size=4096, embed_ttl=None, retrieval_size=1024, retrieval_ttl=600,
+                 answer_size=512, answer_ttl=3600):
+        self.embeddings = TTLCache(embed_size, embed_ttl)
+        self.retrieval = TTLCache(retrieval_size, retrieval_ttl)
+        self.answers = TTLCache(answer_size, answer_ttl)
+        self.index_version = None
+        self._lock = threading.Lock()
+
+    def sync_index_version(self, version):
+        with self._lock:
+            if version != self.index_version:
+                self.retrieval.clear()
+                self.answers.clear()
+                self.index_version = version
+
+    def embed_query(self, embedder, query: str):
+        key = normalize_query(query)
+        vec = self.embeddings.get(key)
+        if vec is _MISS:
+            vec = embedder.embed_query(query)
+            self.embeddings.put(key, vec)
+        return vec
+
+    def retrieve_hits(self, retriever, q_vec, filters=None):
+        key = (
+            hashlib.sha1(array("f", q_vec).tobytes()).hexdigest(),
+            self.index_version,
+            repr(sorted((filters or {}).items())),
+        )
+        hits = self.retrieval.get(key)
+        if hits is _MISS:
+            hits = retriever.retrieve_hits(q_vec, filters)
+            self.retrieval.put(key, hits)
+        return hits
+
+    def _answer_key(self, query: str, hits, model: str):
+        return (normalize_query(query), tuple(h["chunk_id"] for h in hits), model)
+
+    def cached_answer(self, query: str, hits, model: str):
+        """Cached answer `model` wrote for this query and these hits, or None; callers store_answer after generating."""
+        text = self.answers.get(self._answer_key(query, hits, model))
+        return None if text is _MISS else text
+
+    def store_answer(self, query: str, hits, model: str, text: str):
+        self.answers.put(self._answer_key(query, hits, model), text)
+
+    def stats(self):
+        return {name: {"hits": c.hits, "misses": c.misses, "hit_rate": c.hit_rate()}
+                for name, c in (("embeddings", self.embeddings), ("retrieval", self.retrieval), ("answers", self.answers))}
@@ -0,0 +1,183 @@
+# Context assembly: retrieved hits -> merged, de-duplicated passages packed into a token budget, with citations.
+import hashlib
+import re
+from typing import Dict, List, Tuple
+
+from rag.chunking import count_tokens, OVERLAP_TOKENS
+from rag.dedup import MinHasher, DEDUP_THRESHOLD
+
+CONTEXT_TOKENS = 3000       # budget for retrieved text in the prompt (chunker token count)
+
+_SHINGLER = MinHasher()
+
+
+class PackedContext:
+    """
+    Result of pack_context. `blocks` go to the generator as context chunks;
+    `passages` keep file_id, page_no, ords, chunk_ids, sources and label
+    for display. Token counts are for this query's retrieved text before
+    (`raw_tokens`) and after packing (`tokens`).
+    """
+    def __init__(self, passages: List[Dict], raw_tokens: int, n_hits: int, n_merged: int,
+                 n_duplicates: int, n_truncated: int, n_skipped: int):
+        self.passages = passages
+        self.raw_tokens = raw_tokens
+        self.tokens = sum(p["n_tokens"] for p in passages)
+        self.n_hits = n_hits
+        self.n_merged = n_merged
+        self.n_duplicates = n_duplicates
+        self.n_truncated = n_truncated
+        self.n_skipped = n_skipped
+
+    @property
+    def blocks(self) -> List[str]:
+        return [f"{p['label']}\n{p['text']}" for p in self.passages]
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.raw_tokens - self.tokens
+
+    def summary(self) -> str:
+        saved = self.saved_tokens / self.raw_tokens if self.raw_tokens else 0.0
+        parts = [f"context {self.raw_tokens} → {self.tokens} tokens (−{saved:.0%})",
+                 f"{self.n_hits} chunks → {len(self.passages)} passages"]
+        if self.n_merged:
+            parts.append(f"{self.n_merged} merged")
+        if self.n_duplicates:
+            parts.append(f"{self.n_duplicates} duplicates dropped")
+        if self.n_truncated or self.n_skipped:
+            parts.append(f"{self.n_truncated} cut / {self.n_skipped} left out by budget")
+        return " · ".join(parts)
+
+
+def _overlap_words(a: List[str], b: List[str]) -> int:
+    """Length of the longest suffix of a that is a prefix of b (the chunker's carried-over tail)."""
+    for k in range(min(len(a), len(b), 2 * OVERLAP_TOKENS), 0, -1):
+        if a[-k:] == b[:k]:
+            return k
+    return 0
+
+def _drop_words(text: str, k: int) -> str:
+    m = re.match(r"\s*(?:\S+(?:\s+|$)){%d}" % k, text)
+    return text[m.end():] if m else text
+
+def _set_parts(p: Dict, parts: List[Dict]):
+    """Rebuild a passage from its chunks: the first in full, the rest without the overlap they repeat."""
+    p["parts"] = parts
+    p["text"] = "\n".join([parts[0]["text"]] + [q["tail"] for q in parts[1:]])
+    p["n_tokens"] = count_tokens(p["text"])
+    p["ords"] = [q["ord"] for q in parts]
+    p["chunk_ids"] = [q["chunk_id"] for q in parts]
+    p["char_start"], p["char_end"] = parts[0]["char_start"], parts[-1]["char_end"]
+
+def _trim(p: Dict, max_tokens: int) -> bool:
+    """
+    Shrink a merged passage to max_tokens by dropping whole chunks from its ends,
+    the lower-scored end first, so the best-scored chunk always stays. False if
+    not even that chunk fits.
+    """
+    parts = p["parts"]
+    while len(parts) > 1 and p["n_tokens"] > max_tokens:
+        parts = parts[1:] if parts[0]["score"] < parts[-1]["score"] else parts[:-1]
+        _set_parts(p, parts)
+    return p["n_tokens"] <= max_tokens
+
+def _adjacent(a: Dict, b: Dict) -> bool:
+    """b directly continues a on the same page: spans overlap/touch, or consecutive ord without spans."""
+    if a.get("char_end") is not None and b.get("char_start") is not None:
+        return b["char_start"] <= a["char_end"]
+    return a.get("ord") is not None and b.get("ord") == a["ord"] + 1
+
+def merge_hits(hits: List[Dict]) -> List[Dict]:
+    """
+    Fold hits from the same page that continue each other into one passage,
+    writing the overlap the chunker repeats at the start of each chunk only once.
+    A passage scores as its best chunk; `parts` keeps the chunks for _trim.
+    """
+    pages = {}
+    for h in hits:
+        pages.setdefault((h.get("file_id"), h.get("page_no")), []).append(h)
+    passages = []
+    for (file_id, page_no), group in pages.items():
+        group.sort(key=lambda h: h.get("ord") or 0)
+        cur = None
+        for h in group:
+            if cur is not None and h["chunk_id"] in cur["chunk_ids"]:
+                continue
+            part = {"chunk_id": h["chunk_id"], "ord": h.get("ord"), "text": h["text"], "tail": h["text"],
+                    "score": h.get("score") or 0.0, "char_start": h.get("char_start"), "char_end": h.get("char_end")}
+            if cur is not None and _adjacent(cur["parts"][-1], h):
+                prev = cur["parts"][-1]["text"]
+                part["tail"] = _drop_words(h["text"], _overlap_words(prev.split(), h["text"].split()))
+                cur["parts"].append(part)
+                cur["chunk_ids"].append(h["chunk_id"])
+                cur["score"] = max(cur["score"], part["score"])
+                cur["char_end"] = part["char_end"]
+                continue
+            cur = {"file_id": file_id, "page_no": page_no, "parts": [part], "chunk_ids": [h["chunk_id"]],
+                   "score": part["score"], "char_start": part["char_start"], "char_end": part["char_end"],
+                   "sources": [(file_id, page_no)]}
+            passages.append(cur)
+    for p in passages:
+        _set_parts(p, p["parts"])
+    return passages
+
+def drop_duplicates(passages: List[Dict], threshold: float = DEDUP_THRESHOLD) -> Tuple[List[Dict], int]:
+    """
+    Best-scored first, drop passages whose text is the same (after whitespace/case
+    folding) as, or whose word shingles are >= threshold contained in, a kept one.
+    The dropped passage's location is added to the kept passage's sources.
+    """
+    kept, seen, shingles, dropped = [], {}, [], 0
+    for p in sorted(passages, key=lambda p: -p["score"]):
+        key = hashlib.sha1(" ".join(p["text"].lower().split()).encode()).hexdigest()
+        dup = seen.get(key)
+        if dup is None:
+            s = set(_SHINGLER.shingles(p["text"]).tolist())
+            for q, qs in zip(kept, shingles):
+                if s and len(s & qs) / len(s) >= threshold:
+                    dup = q
+                    break
+        if dup is not None:
+            dup["sources"].extend(src for src in p["sources"] if src not in dup["sources"])
+            dropped += 1
+            continue
+        seen[key] = p
+        kept.append(p)
+        shingles.append(s)
+    return kept, dropped
+
+def pack_context(hits: List[Dict], budget_tokens: int = CONTEXT_TOKENS, dup_threshold: float = DEDUP_THRESHOLD,
+                 names: Dict[str, str] = None, sources: Dict[str, List[Tuple[str, int]]] = None) -> PackedContext:
+    """
+    Merge adjacent/overlapping chunks, drop exact and near duplicates, then fill
+    `budget_tokens` with the best-scored passages (a merged passage that doesn't
+    fit loses whole chunks from its lower-scored end until it does; one that
+    can't keep even its best chunk is skipped for smaller ones). Passages are labelled "[n] name p.X"
+    for citation; `names` maps file_id -> display name and `sources` (see
+    rag.dedup.chunk_sources) adds the locations of index-time duplicates.
+    """
+    merged = merge_hits(hits)
+    passages, n_dup = drop_duplicates(merged, dup_threshold)
+    for p in passages:
+        for cid in p["chunk_ids"]:
+            p["sources"].extend(src for src in (sources or {}).get(cid, []) if src not in p["sources"])
+
+    packed, used, n_truncated, n_skipped = [], 0, 0, 0
+    for p in passages:
+        room = budget_tokens - used
+        if p["n_tokens"] > room:
+            if not _trim(p, room):
+                n_skipped += 1
+                continue
+            n_truncated += 1
+        packed.append(p)
+        used += p["n_tokens"]
+
+    names = names or {}
+    for i, p in enumerate(packed, 1):
+        where = [f"{names.get(fid, fid)} p.{pno}" for fid, pno in p["sources"]]
+        p["label"] = f"[{i}] {where[0]}" + (f" (also {', '.join(where[1:])})" if len(where) > 1 else "")
+
+    raw_tokens = sum(count_tokens(h["text"]) for h in hits)
+    return PackedContext(packed, raw_tokens, len(hits), len(hits) - len(merged), n_dup, n_truncated, n_skipped)
@@ -1,16 +1,29 @@
 # rag/generator/gemini_generator.py
+import queue
+import asyncio
+import threading
 from google import genai
 
 class RAGGenerator:
-    def __init__(self, primary_model="models/gemini-2.5-flash", fallback_model="models/gemma-3-27b"):
-        self.client = genai.Client(api_key="") 
+    """
+    Answer generation. `generate_answer` is the blocking path; `stream_answer`
+    streams tokens under a per-request deadline and hedges with the fallback
+    model when the primary has not produced a first token within
+    `hedge_after_s` (the loser is cancelled). Timings of the last streamed
+    answer are kept in `last_metrics`.
+    """
+    def __init__(self, primary_model="models/gemini-2.5-flash", fallback_model="models/gemma-3-27b",
+                 client=None, hedge_after_s: float = 2.0, deadline_s: float = 60.0):
+        self.client = client or genai.Client(api_key="") 
         self.primary_model = primary_model
         self.fallback_model = fallback_model
+        self.hedge_after_s = hedge_after_s
+        self.deadline_s = deadline_s
+        self.last_metrics = None
 
-    def generate_answer(self, query: str, context_chunks: list):
-        # Build system + user prompt
+    def _build_prompt(self, query: str, context_chunks: list) -> str:
         context_text = "\n\n".join(context_chunks)
-        prompt = f"""
+        return f"""
 You are a helpful assistant answering questions based on the following documents:
 
 {context_text}
@@ -18,7 +31,12 @@ You are a helpful assistant answering questions based on the following documents
 Question: {query}
 
 Answer concisely and accurately. If unknown, say 'I don't know'.
+When the documents are labelled like [1], cite the labels you used.
 """
+
+    def generate_answer(self, query: str, context_chunks: list):
+        # Build system + user prompt
+        prompt = self._build_prompt(query, context_chunks)
         try:
             # Primary generation
             response = self.client.models.generate_content(
@@ -36,3 +54,110 @@ Answer concisely and accurately. If unknown, say 'I don't know'.
             )
             return response.text
 
+    # -----------------------------
+    # Streaming, hedged generation
+    # -----------------------------
+    async def _pump(self, model: str, prompt: str, out: asyncio.Queue):
+        """Stream one model's tokens into `out` as (model, kind, value) items."""
+        try:
+            stream = await self.client.aio.models.generate_content_stream(
+                model=model, contents=prompt, config={"temperature": 0.0}
+            )
+            async for chunk in stream:
+                if chunk.text:
+                    await out.put((model, "tok", chunk.text))
+            await out.put((model, "end", None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await out.put((model, "err", e))
+
+    async def astream_answer(self, query: str, context_chunks: list, deadline_s: float = None,
+                             hedge_after_s: float = None):
+        """Async generator of answer text pieces from whichever model answers first."""
+        loop = asyncio.get_running_loop()
+        deadline_s = self.deadline_s if deadline_s is None else deadline_s
+        hedge_after_s = self.hedge_after_s if hedge_after_s is None else hedge_after_s
+        prompt = self._build_prompt(query, context_chunks)
+        out = asyncio.Queue()
+        start = loop.time()
+        deadline, hedge_at = start + deadline_s, start + hedge_after_s
+        metrics = {"model": None, "hedged": False, "timed_out": False, "ttft_s": None, "total_s": None}
+
+        tasks = {self.primary_model: asyncio.create_task(self._pump(self.primary_model, prompt, out))}
+        def start_fallback():
+            if self.fallback_model not in tasks:
+                metrics["hedged"] = True
+                tasks[self.fallback_model] = asyncio.create_task(self._pump(self.fallback_model, prompt, out))
+
+        winner, errors = None, {}
+        try:
+            while True:
+                now = loop.time()
+                if now >= deadline:
+                    metrics["timed_out"] = True
+                    if winner is None:
+                        raise TimeoutError(f"No answer within {deadline_s}s")
+                    break
+                timeout = deadline - now
+                if winner is None and self.fallback_model not in tasks:
+                    timeout = min(timeout, max(hedge_at - now, 0))
+                try:
+                    model, kind, value = await asyncio.wait_for(out.get(), timeout)
+                except asyncio.TimeoutError:
+                    if winner is None and loop.time() >= hedge_at:
+                        start_fallback()
+                    continue
+
+                if winner is not None and model != winner:
+                    continue
+                if kind == "err":
+                    if winner is not None:
+                        raise value
+                    errors[model] = value
+                    start_fallback()  # primary failed before its first token: don't wait for the hedge timer
+                    if len(errors) == len(tasks):
+                        raise value
+                    continue
+                if winner is None:
+                    winner = model
+                    metrics["model"] = model
+                    metrics["ttft_s"] = loop.time() - start
+                    for m, t in tasks.items():
+                        if m != winner:
+                            t.cancel()
+                if kind == "end":
+                    break
+                yield value
+        finally:
+            for t in tasks.values():
+                t.cancel()
+            metrics["total_s"] = loop.time() - start
+            self.last_metrics = metrics
+
+    def stream_answer(self, query: str, context_chunks: list, **kwargs):
+        """
+        Blocking generator over `astream_answer` (runs its own event loop in a
+        thread), e.g. for `st.write_stream`.
+        """
+        q = queue.Queue()
+        done = object()
+
+        def run():
+            async def consume():
+                async for piece in self.astream_answer(query, context_chunks, **kwargs):
+                    q.put(piece)
+            try:
+                asyncio.run(consume())
+                q.put(done)
+            except BaseException as e:
+                q.put(e)
+
+        threading.Thread(target=run, daemon=True).start()
+        while True:
+            item = q.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
@@ -1,19 +1,16 @@
 # rag/retriever/query_embedder.py
-from google import genai
-from google.genai import types
+from rag.embed import get_embedder
 
 class QueryEmbedder:
-    def __init__(self, model="text-embedding-004", output_dim=768):
-        self.client = genai.Client(api_key="")
-        self.model = model
+    """
+    Query-side embedder. Must use the same backend/model/dim as run_indexing,
+    e.g. QueryEmbedder(backend="hashing") for a fully offline setup.
+    """
+    def __init__(self, model=None, output_dim=768, backend="gemini", **backend_opts):
+        self.embedder = get_embedder(backend, model=model, output_dim=output_dim, **backend_opts)
+        self.model = self.embedder.model
         self.output_dim = output_dim
 
 
     def embed_query(self, query: str):
-        resp = self.client.models.embed_content(
-            model=self.model,
-            contents=[query],
-            config=types.EmbedContentConfig(output_dimensionality=self.output_dim)
-        )
-
-        return resp.embeddings[0].values
+        return self.embedder.embed_query(query)
@@ -1,25 +1,74 @@
 # rag/retriever/opensearch_retriever.py
 from opensearchpy import OpenSearch
+from index.open_index import knn_query
+
+# Only what hits/context packing use; the 768-d embedding stays on the server
+HIT_FIELDS = ["file_id", "page_no", "ord", "char_start", "char_end", "text"]
+MSEARCH_BATCH = 100  # searches per msearch request
 
 class OpenSearchRetriever:
-    def __init__(self, client: OpenSearch, index_name="rag-chunks", k=6):
+    def __init__(self, client: OpenSearch, index_name="rag-chunks", k=6, msearch_batch: int = MSEARCH_BATCH):
         self.client = client
         self.index_name = index_name
         self.k = k
+        self.msearch_batch = msearch_batch
 
-    def retrieve(self, query_vec):
-        body = {
-            "size": self.k,
-            "query": {
-                "knn": {
-                    "embedding": {
-                        "vector": query_vec,
-                        "k": self.k
-                    }
-                }
-            }
+    def _body(self, query_vec, filters=None, k: int = None):
+        k = k or self.k
+        return {
+            "size": k,
+            "_source": HIT_FIELDS,
+            "query": knn_query(query_vec, k, filters)
         }
-        resp = self.client.search(index=self.index_name, body=body)
-        # Return list of text chunks
-        hits = [hit["_source"]["text"] for hit in resp["hits"]["hits"]]
+
+    @staticmethod
+    def _hits(resp):
+        hits = []
+        for hit in resp["hits"]["hits"]:
+            src = hit["_source"]
+            hits.append({
+                "chunk_id": hit["_id"],
+                "file_id": src.get("file_id"),
+                "page_no": src.get("page_no"),
+                "ord": src.get("ord"),
+                "char_start": src.get("char_start"),
+                "char_end": src.get("char_end"),
+                "text": src["text"],
+                "score": hit.get("_score"),
+            })
         return hits
+
+    def retrieve_hits(self, query_vec, filters=None):
+        """
+        Top-k hits as dicts: chunk_id, file_id, page_no, ord, char_start, char_end, text, score.
+        filters: optional scope, e.g. {"file_ids": [...], "uploaded_after": dt,
+        "page_from": 1, "page_to": 20} (see index.open_index.build_knn_filter).
+        Applied as a kNN pre-filter, not on the returned top-k.
+        """
+        resp = self.client.search(index=self.index_name, body=self._body(query_vec, filters))
+        return self._hits(resp)
+
+    def retrieve_many(self, query_vecs, filters=None, k: int = None):
+        """
+        Hits (as retrieve_hits) for many query vectors at once, `msearch_batch`
+        searches per msearch round trip. filters: one scope for every query, or
+        a list with one scope (or None) per query. Returns one hit list per
+        query, in order; a failed search raises RuntimeError.
+        """
+        per_query = filters if isinstance(filters, list) else [filters] * len(query_vecs)
+        out = []
+        for i in range(0, len(query_vecs), self.msearch_batch):
+            body = []
+            for q_vec, flt in zip(query_vecs[i:i + self.msearch_batch], per_query[i:i + self.msearch_batch]):
+                body.append({"index": self.index_name})
+                body.append(self._body(q_vec, flt, k))
+            resp = self.client.msearch(body=body, index=self.index_name)
+            for j, r in enumerate(resp["responses"]):
+                if "error" in r:
+                    raise RuntimeError(f"msearch query {i + j} failed ({r.get('status')}): {r['error']}")
+                out.append(self._hits(r))
+        return out
+
+    def retrieve(self, query_vec, filters=None):
+        # Return list of text chunks
+        return [hit["text"] for hit in self.retrieve_hits(query_vec, filters)]
@@ -1,39 +1,62 @@
+import time
+
 import duckdb
 
 DB_PATH = "C:\\Projects\\Project RAG\\V3\\rag_demo.duckdb"
-con = duckdb.connect(DB_PATH)
-
-con.execute("""
-CREATE TABLE IF NOT EXISTS files (
-    file_id VARCHAR PRIMARY KEY,
-    file_name VARCHAR,
-    path VARCHAR,
-    uploaded_at TIMESTAMP DEFAULT (now())
-);
-""")
-
-con.execute("""
-CREATE TABLE IF NOT EXISTS pages (
-    page_id VARCHAR PRIMARY KEY,
-    file_id VARCHAR REFERENCES files(file_id),
-    page_no INTEGER,
-    text TEXT,
-    n_tokens INTEGER,
-    ocr_needed BOOLEAN DEFAULT FALSE,
-    ocr_done BOOLEAN DEFAULT FALSE,
-    embedding BLOB
-);
-""")
-                               
-con.execute("""
-CREATE TABLE IF NOT EXISTS ingest_events (
-    event_id VARCHAR PRIMARY KEY,
-    file_id VARCHAR,
-    stage VARCHAR,
-    ok BOOLEAN,
-    message TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-""")
-
-print("DuckDB schema created")
+LOCK_RETRY_S = 0.1  # poll interval while another process holds the DB file
+
+def connect(db_path: str, read_only: bool = False, timeout_s: float = 30.0):
+    """
+    duckdb.connect that waits up to `timeout_s` for another process to release
+    the file lock (DuckDB allows one process per file), then re-raises.
+    """
+    deadline = time.monotonic() + timeout_s
+    while True:
+        try:
+            return duckdb.connect(db_path, read_only=read_only)
+        except duckdb.IOException as e:
+            if "lock" not in str(e).lower() or time.monotonic() >= deadline:
+                raise
+            time.sleep(LOCK_RETRY_S)
+
+
+def create_schema(con):
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS files (
+        file_id VARCHAR PRIMARY KEY,
+        file_name VARCHAR,
+        path VARCHAR,
+        uploaded_at TIMESTAMP DEFAULT (now()),
+        content_hash VARCHAR
+    );
+    """)
+
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS pages (
+        page_id VARCHAR PRIMARY KEY,
+        file_id VARCHAR REFERENCES files(file_id),
+        page_no INTEGER,
+        text TEXT,
+        n_tokens INTEGER,
+        ocr_needed BOOLEAN DEFAULT FALSE,
+        ocr_done BOOLEAN DEFAULT FALSE,
+        embedding BLOB
+    );
+    """)
+
+    # Tables owned by a pipeline module are created (and migrated) by that module
+    from index.duck_index import ensure_index_state
+    ensure_index_state(con)
+    from rag.embed_cache import ensure_embedding_cache_table
+    ensure_embedding_cache_table(con)
+    from rag.dedup import ensure_dedup_tables
+    ensure_dedup_tables(con)
+    from rag.metrics import ensure_event_columns
+    ensure_event_columns(con)
+    from parsers.ocr_cache import ensure_ocr_cache_table
+    ensure_ocr_cache_table(con)
+
+if __name__ == "__main__":
+    con = duckdb.connect(DB_PATH)
+    create_schema(con)
+    print("DuckDB schema created")